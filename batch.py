@@ -0,0 +1,115 @@
+import sys
+import copy
+import logging
+
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+import numpy as np
+
+import collector
+import dbconnector
+import decomposer
+import minimizer
+import bmconnector
+import history
+import profiler
+import tracer
+import writer
+from main import get_statistics, write_back
+
+WORKERS = 4 # number of orders that are collected concurrently
+
+def collect(orders):
+    # all orders share the connection pool and the weekly plans of their resources
+    plans = {}
+    with ThreadPoolExecutor(max_workers=WORKERS) as executor:
+        data = list(executor.map(tracer.wrap(lambda order: collector.get_data(order, plans=plans)), orders))
+        starts = list(executor.map(tracer.wrap(dbconnector.get_order_startdate), orders))
+    logging.info(f"Collected {len(orders)} orders with weekly plans of {len(plans)} resources")
+    return data, [collector.to_date(start) for start in starts]
+
+def reserve(data, start, committed):
+    # copy of the instance with the schedules reduced by the working minutes already committed to earlier orders of the batch
+    data = copy.copy(data)
+    data.schedule = np.array(data.schedule, copy=True)
+    reserved = 0
+    for r, resource in enumerate(data.resources):
+        if resource not in committed:
+            continue
+        for d in range(data.l):
+            minutes = committed[resource].get(start + timedelta(days=d), 0)
+            if minutes:
+                reserved += min(minutes, data.schedule[r][d])
+                data.schedule[r][d] = max(0, data.schedule[r][d] - minutes)
+    return data, reserved
+
+def commit(data, start, result, committed):
+    # working minutes per resource and date of the assignment
+    for j, r in enumerate(result.assignment):
+        resource = data.resources[r-1] # minizinc index 1..n vs. 0..n-1
+        for d in np.flatnonzero(data.planned[j]):
+            committed[resource][start + timedelta(days=int(d))] += int(data.planned[j][d])
+
+def optimize(orders, target_active):
+    with tracer.span("collect"):
+        data, starts = collect(orders)
+
+    # orders that start earlier get the first choice of resources
+    sequence = sorted(range(len(orders)), key=lambda o: starts[o])
+
+    committed = defaultdict(lambda: defaultdict(int))
+    results = {}
+    for o in sequence:
+        order = orders[o]
+        reserved_data, reserved = reserve(data[o], starts[o], committed)
+        logging.info(f"Order {order}: {reserved} working minutes already committed to earlier orders of the batch")
+
+        iso_active = dbconnector.is_iso_active(order)
+        hint = history.load_hint(order, data[o])
+        with tracer.span("solve", order=order) as span:
+            result = decomposer.solve(reserved_data, iso_active, target_active, minimizer.BUDGET, hint=hint)
+            span.set(status=result.status.name)
+
+        if result.status in (minimizer.AssignmentStatus.ALTERNATIVE, minimizer.AssignmentStatus.OPTIMAL, minimizer.AssignmentStatus.FEASIBLE):
+            # the history keeps the unreduced instance
+            history.save_assignment(order, data[o], result, minimizer.get_gap(result))
+        # only assignments that are written back take capacity from later orders
+        if result.status in (minimizer.AssignmentStatus.OPTIMAL, minimizer.AssignmentStatus.FEASIBLE):
+            commit(data[o], starts[o], result, committed)
+
+        results[order] = (data[o], result)
+
+    return results
+
+if __name__ == "__main__":
+
+    logging.basicConfig(filename='logger.log', format='%(asctime)s %(levelname)s: %(message)s', datefmt='%d/%m/%y %H:%M:%S', level=logging.INFO)
+
+    # parse arguments [scriptname, host, order, order, ...]
+    if len(sys.argv) < 3:
+        print("usage: batch.py <host> <order> [<order> ...]")
+        sys.exit(1)
+    HOSTNAME = sys.argv[1]
+    ORDERS = list(dict.fromkeys(sys.argv[2:]))
+
+    target_active = dbconnector.is_target_profit_margin_active()
+
+    logging.info(f"Start batch optimization of orders {ORDERS}")
+    with tracer.trace("batch", orders=ORDERS):
+        results = optimize(ORDERS, target_active)
+
+        # connect to bm once for all orders
+        bmconnector.login(HOSTNAME)
+
+        for order, (data, result) in results.items():
+            print(f"Order {order}: {result.status.name}")
+            statistics = get_statistics(data, result, target_active)
+            with tracer.span("write-back", order=order):
+                print(writer.summarize(write_back(order, data, result, statistics)))
+
+    if profiler.enabled:
+        summary = profiler.get_summary()
+        print(profiler.report(summary))
+        profiler.save(f"batch {ORDERS}", summary)
@@ -0,0 +1,194 @@
+import sys
+import json
+import time
+import logging
+import argparse
+import platform
+import statistics
+
+from datetime import datetime
+
+import numpy as np
+
+import minimizer
+from collector import AssignmentData, get_parallel_pairs
+
+# grid of problem sizes: (resources n, items k, days l), the number of jobs follows from the workflows
+SIZES = {
+    "small": [(10, 2, 14), (20, 4, 21)],
+    "medium": [(40, 8, 30), (80, 12, 45)],
+    "large": [(150, 20, 60), (300, 40, 90)],
+}
+
+# typical workflows of an item
+WORKFLOWS = [["TRA", "REV"], ["TRA", "REV", "DTP"], ["TRA"], ["DTP"]]
+WORKFLOW_WEIGHTS = [0.5, 0.3, 0.15, 0.05]
+
+# price per job (in EUR) of an average resource
+BASE_PRICE = {"TRA": 400, "REV": 150, "DTP": 100}
+
+# item profit relative to the average eligible costs and item target profit margins
+MARGINS = {
+    "loose": (1.6, 0.2),
+    "tight": (1.15, 0.3),
+}
+
+DENSITY = 0.15 # share of resources that are eligible for a job
+MIN_DURATION = 0.05 # phases faster than this (in seconds) are too noisy to be compared
+
+def generate(n, k, l, margin="loose", seed=0):
+    rng = np.random.default_rng(seed)
+
+    # every item gets a workflow, jobs of a workflow run one after another
+    workflows = [WORKFLOWS[w] for w in rng.choice(len(WORKFLOWS), size=k, p=WORKFLOW_WEIGHTS)]
+    m = sum(len(workflow) for workflow in workflows)
+
+    data = AssignmentData(n, m, k, l)
+    data.resources = list(range(1, n+1))
+    data.jobs = list(range(1, m+1))
+    data.items = list(range(1, k+1))
+
+    # resources offer one or more job types, with their own quality and price level
+    skills = rng.random((n, len(BASE_PRICE))) < 0.6
+    skills[np.arange(n), rng.integers(len(BASE_PRICE), size=n)] = True
+    rates = rng.uniform(0.7, 1.4, size=n)
+    quality = rng.integers(1, 6, size=n)
+
+    # working minutes per day, every resource has a weekly pattern (weekends off for most)
+    week = np.tile([480, 480, 480, 480, 480, 0, 0], (n, 1))
+    week[rng.random(n) < 0.3] //= 2 # part time
+    week[rng.random(n) < 0.1, 5:] = 240 # weekend work
+    schedule = week[:, np.arange(l) % 7]
+
+    profit = []
+    j = 0
+    for i, workflow in enumerate(workflows):
+        size = rng.uniform(0.5, 3.0) # relative size of the item
+        start = int(rng.integers(0, max(1, l - 2*len(workflow))))
+        costs = 0.0
+        for step, jobtype in enumerate(workflow):
+            data.jobtype.append(jobtype)
+            data.item.append(i+1) # minizinc index starts with 1
+            if step + 1 < len(workflow):
+                data.workflow[j]["set"] = [j+2]
+
+            # sparse eligibility, at least one resource matches
+            t = list(BASE_PRICE).index(jobtype)
+            eligible = skills[:, t] & (rng.random(n) < DENSITY)
+            if not eligible.any():
+                eligible[rng.choice(np.flatnonzero(skills[:, t]))] = True
+            data.ranking[eligible, j] = np.clip(quality[eligible] + rng.integers(-1, 2, size=eligible.sum()), 1, 5)
+            data.price[eligible, j] = np.rint(BASE_PRICE[jobtype] * size * rates[eligible])
+            costs += data.price[eligible, j].mean()
+
+            # planned working minutes per day over the job's duration
+            duration = int(rng.integers(1, 5))
+            end = min(l, start + duration)
+            data.planned[j, start:end] = rng.integers(60, 300)
+            start = min(l - 1, end)
+            j += 1
+
+        profit.append(round(costs * MARGINS[margin][0] * rng.uniform(0.9, 1.1)))
+
+    data.profit = profit
+    data.item_targets = [MARGINS[margin][1] for i in range(k)]
+    data.schedule = schedule
+    data.item_constraints = [margin == "tight" and i % 2 == 0 for i in range(k)]
+    data.target = MARGINS[margin][1]
+    data.target_weights = rng.integers(1, 4, size=k)
+    data.ranking_weights = rng.integers(1, 4, size=k)
+    data.parallel = get_parallel_pairs(data.planned)
+
+    return data
+
+def get_cases(sizes, isos, margins, seeds):
+    for size in sizes:
+        for n, k, l in SIZES[size]:
+            for iso in isos:
+                for margin in margins:
+                    for seed in seeds:
+                        yield f"n{n}-k{k}-l{l}-{'iso' if iso else 'noiso'}-{margin}-s{seed}", (n, k, l, iso, margin, seed)
+
+def measure(case, repeat, workers):
+    n, k, l, iso, margin, seed = case
+    data = generate(n, k, l, margin, seed)
+
+    runs = []
+    for r in range(repeat):
+        start = time.perf_counter()
+        result = minimizer.solve(data, iso, margin == "tight", None, workers, use_cache=False)
+        runs.append((time.perf_counter() - start, result))
+
+    # the median run is reported, single runs are noisy
+    phases = {phase for total, result in runs for phase in result.timings}
+    return {
+        "n": n, "m": data.m, "k": k, "l": l, "iso": iso, "margin": margin, "seed": seed,
+        "status": runs[-1][1].status.name,
+        "total": statistics.median(total for total, result in runs),
+        "timings": {phase: statistics.median(result.timings.get(phase, 0.0) for total, result in runs) for phase in sorted(phases)},
+    }
+
+def compare(report, baseline, tolerance):
+    # a regression is a status change or a phase that got slower by more than the tolerance
+    regressions = []
+    for name, run in report["runs"].items():
+        if name not in baseline["runs"]:
+            continue
+        base = baseline["runs"][name]
+
+        if run["status"] != base["status"]:
+            regressions.append(f"{name}: status {base['status']} -> {run['status']}")
+
+        phases = {"total": (run["total"], base["total"])}
+        phases.update({phase: (duration, base["timings"][phase]) for phase, duration in run["timings"].items() if phase in base["timings"]})
+        for phase, (duration, reference) in phases.items():
+            if duration > MIN_DURATION and duration > reference * (1 + tolerance):
+                regressions.append(f"{name}: {phase} {reference:.3f}s -> {duration:.3f}s (+{(duration/max(reference, 1e-9)-1)*100:.0f}%)")
+
+    return regressions
+
+if __name__ == "__main__":
+
+    logging.basicConfig(filename='benchmark.log', format='%(asctime)s %(levelname)s: %(message)s', datefmt='%d/%m/%y %H:%M:%S', level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description="Scaling benchmark of the optimizer on synthetic problem instances.")
+    parser.add_argument("--sizes", nargs="+", choices=list(SIZES), default=["small", "medium"], help="size classes of the grid")
+    parser.add_argument("--iso", choices=["on", "off", "both"], default="both", help="ISO 17100 constraint")
+    parser.add_argument("--margins", nargs="+", choices=list(MARGINS), default=list(MARGINS), help="target profit margins")
+    parser.add_argument("--seeds", type=int, default=1, help="number of instances per grid point")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per instance, the median is reported")
+    parser.add_argument("--workers", type=int, default=minimizer.WORKERS, help="number of parallel solver processes")
+    parser.add_argument("--output", default="benchmark.json", help="file the results are written to")
+    parser.add_argument("--baseline", help="results of an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown against the baseline (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    isos = {"on": [True], "off": [False], "both": [False, True]}[args.iso]
+
+    report = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "workers": args.workers,
+        "repeat": args.repeat,
+        "runs": {},
+    }
+
+    for name, case in get_cases(args.sizes, isos, args.margins, range(args.seeds)):
+        run = measure(case, args.repeat, args.workers)
+        report["runs"][name] = run
+        print(f"{name:<36} m={run['m']:<4} {run['status']:<14} {run['total']:8.3f}s")
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        print(f"{len(regressions)} regression(s) against {args.baseline}")
+        if regressions:
+            sys.exit(1)
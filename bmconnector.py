@@ -1,130 +1,180 @@
 import logging
+import threading
 
+import requests
+from requests.adapters import HTTPAdapter
 from zeep import Client
+from zeep.cache import SqliteCache
+from zeep.transports import Transport
 from zeep.xsd.types.builtins import Boolean
 
 import config as cfg
+import tracer
 
-hostname = None
-uuid = None
 TYPE = 3 # 3 = order, 1 = quote
 
+WSDL_CACHE = getattr(cfg, "wsdl_cache", "wsdl_cache.db") # downloaded WSDL/XSD documents are kept on disk
+WSDL_CACHE_TIMEOUT = 7 * 24 * 3600 # in seconds
+CONNECTIONS = 16 # kept alive per service host
+
+class Session:
+
+    def __init__(self, host):
+        self.hostname = host
+        self.uuid = None
+        self.clients = {}
+        self.lock = threading.Lock()
+        self.login_lock = threading.Lock()
+
+        # one keep-alive http session for all services
+        http = requests.Session()
+        http.mount('https://', HTTPAdapter(pool_connections=4, pool_maxsize=CONNECTIONS))
+        self.transport = Transport(session=http, cache=SqliteCache(path=WSDL_CACHE, timeout=WSDL_CACHE_TIMEOUT))
+
+    def client(self, service):
+        # the WSDL of every service is only parsed once per session
+        with self.lock:
+            if service not in self.clients:
+                self.clients[service] = Client('https://{}/{}?wsdl'.format(self.hostname, service), transport=self.transport)
+            return self.clients[service]
+
+    def login(self):
+        with tracer.span("bm", operation="login"):
+            self.uuid = self.client('PlunetAPI').service.login(cfg.bm['user'], cfg.bm['password'])
+        return self.uuid
+
+    def relogin(self, expired):
+        with self.login_lock:
+            # another thread may have renewed the uuid already
+            if self.uuid == expired:
+                logging.info("BM session expired, logging in again")
+                self.login()
+
+    def call(self, service, operation, *args):
+        with tracer.span("bm", service=service, operation=operation):
+            uuid = self.uuid
+            result = getattr(self.client(service).service, operation)(uuid, *args)
+
+            if is_expired(result):
+                self.relogin(uuid)
+                result = getattr(self.client(service).service, operation)(self.uuid, *args)
+
+        return result
+
+def is_expired(result):
+    # the BM answers requests with an invalid or expired uuid with a corresponding status message
+    message = getattr(result, 'statusMessage', None)
+    return bool(message) and 'uuid' in message.lower()
+
+session = None
+
 def login(host):
-    global hostname
-    global uuid
+    global session
 
-    hostname = host
+    if session is None or session.hostname != host:
+        session = Session(host)
 
-    client = Client('https://{}/PlunetAPI?wsdl'.format(hostname))
-    uuid = client.service.login(cfg.bm['user'], cfg.bm['password'])
-    return uuid
+    return session.login()
 
 ###### ORDER #####
 
 def get_order(order):
-    client = Client('https://{}/DataOrder30?wsdl'.format(hostname))
-    result = client.service.getOrderObject2(uuid, order)
+    result = session.call('DataOrder30', 'getOrderObject2', order)
     if result.statusMessage == 'OK':
         return result.data
     else:
         logging.ERROR("No order found with given number.")
 
 def get_order_id(order):
-    client = Client('https://{}/DataOrder30?wsdl'.format(hostname))
-    result = client.service.getOrderID(uuid, order)
+    result = session.call('DataOrder30', 'getOrderID', order)
     if result.statusMessage == 'OK':
         return result.data.getData()
     else:
         logging.ERROR("No order found with given number.")
 
 def iso_active(order_id):
-    client = Client('https://{}/DataOrder30?wsdl'.format(hostname))
-    result = client.service.checkEN15038(uuid, order_id)
+    result = session.call('DataOrder30', 'checkEN15038', order_id)
     if result.statusMessage == 'OK':
         result.data.getData()
     else:
         return result.statusMessage
 
 def set_description(order_id, description):
-    client = Client('https://{}/DataOrder30?wsdl'.format(hostname))
-    result = client.service.setSubject(uuid, description, order_id)
+    result = session.call('DataOrder30', 'setSubject', description, order_id)
     if result.statusMessage == 'OK':
         logging.info(f"Statistics successfully updated for order {order_id}.")
+        return True
     else:
         logging.warning(f"A problem occurred while updating statistics for order {order_id}: {result.statusMessage}")
+        return False
 
 ##### ITEM #####
 
 def get_items(order_id):
-    client = Client('https://{}/DataItem30?wsdl'.format(hostname))
-    result = client.service.getAllItems(uuid, order_id, TYPE)
+    result = session.call('DataItem30', 'getAllItems', order_id, TYPE)
     if result.statusMessage == 'OK':
         return result.data
     else:
         logging.ERROR("No order found with given number.")
 
 def get_jobs_of_item(item_id):
-    client = Client('https://{}/DataItem30?wsdl'.format(hostname))
-    result = client.service.getJobs(uuid, TYPE, item_id)
+    result = session.call('DataItem30', 'getJobs', TYPE, item_id)
     if result.statusMessage == 'OK':
         return result.data
     else:
         logging.ERROR("No item found with given number.")
 
 def get_price(item_id):
-    client = Client('https://{}/DataItem30?wsdl'.format(hostname))
-    result = client.service.getTotalPrice(uuid, TYPE, item_id)
+    result = session.call('DataItem30', 'getTotalPrice', TYPE, item_id)
     if result.statusMessage == 'OK':
         return result.data
     else:
         logging.ERROR("No item found with given number.")
 
 def get_note(item_id):
-    client = Client('https://{}/DataItem30?wsdl'.format(hostname))
-    result = client.service.getComment(uuid, TYPE, item_id)
+    result = session.call('DataItem30', 'getComment', TYPE, item_id)
     if result.statusMessage == 'OK':
         return result.data
     else:
         logging.error(f"No item found with given number {item_id}: {result.statusMessage}")
 
 def set_note(item_id, note):
-    client = Client('https://{}/DataItem30?wsdl'.format(hostname))
-    result = client.service.setComment(uuid, note, TYPE, item_id) 
+    result = session.call('DataItem30', 'setComment', note, TYPE, item_id) 
     if result.statusMessage == 'OK':
         logging.info(f"Statistics successfully updated for item {item_id}.")
+        return True
     else:
         logging.warning(f"A problem occurred while updating statistics for item {item_id}: {result.statusMessage}")
+        return False
 
 ##### JOB #####
 
 ##### ROUND #####
 
 def get_round(round_id):
-    client = Client('https://{}/DataJobRound30?wsdl'.format(hostname))
-    round = client.service.getRoundObject(uuid, round_id).data
+    round = session.call('DataJobRound30', 'getRoundObject', round_id).data
     return round
 
 def get_current(job_id):
-    client  = Client('https://{}/DataJobRound30?wsdl'.format(hostname))
-    round_ids = client.service.getAllRoundIDs(uuid, job_id, TYPE)
+    round_ids = session.call('DataJobRound30', 'getAllRoundIDs', job_id, TYPE)
     
     # TODO find the real current round, this is just a workaround
     for round_id in round_ids:
-        round = client.service.getRoundObject(uuid, round_id).data
+        round = session.call('DataJobRound30', 'getRoundObject', round_id).data
         if round.jobRoundNumber == 1:
             return round_id
         else:
             return None
 
 def get_resources(round_id):
-    client  = Client('https://{}/DataJobRound30?wsdl'.format(hostname))
-    result = client.service.getResourcesForRound(uuid, round_id)
+    result = session.call('DataJobRound30', 'getResourcesForRound', round_id)
     return result
 
 def set_resource(resource_id, round_id):
-    client  = Client('https://{}/DataJobRound30?wsdl'.format(hostname))
-    result = client.service.setResourceForReview(uuid, resource_id, 0, round_id)
+    result = session.call('DataJobRound30', 'setResourceForReview', resource_id, 0, round_id)
     if result.statusMessage == 'OK':
         logging.info(f"Resource {resource_id} successfully set in round {round_id}.")
+        return True
     else:
         logging.warning((f"A problem occurred while setting resource {resource_id} in round {round_id}: {result.statusMessage}"))
+        return False
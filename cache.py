@@ -0,0 +1,75 @@
+import os
+import json
+import pickle
+import hashlib
+import logging
+import dataclasses
+
+from datetime import date
+from decimal import Decimal
+
+import config as cfg
+
+CACHE = getattr(cfg, "cache", "cache") # cache directory
+MAX_ENTRIES = getattr(cfg, "cache_size", 256) # max. number of entries per namespace, least recently used are evicted
+
+def to_json(value):
+    if dataclasses.is_dataclass(value):
+        return {f.name: getattr(value, f.name) for f in dataclasses.fields(value)}
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    if hasattr(value, "tolist"): # numpy arrays and scalars
+        return value.tolist()
+    raise TypeError(f"Cannot hash value of type {type(value)}")
+
+def get_key(*parts):
+    # canonical json representation -> stable hash over runs and processes
+    canonical = json.dumps(parts, default=to_json, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+def get_file_hash(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def get_path(namespace, key):
+    return os.path.join(CACHE, namespace, f"{key}.pickle")
+
+def load(namespace, key):
+    path = get_path(namespace, key)
+    try:
+        with open(path, 'rb') as f:
+            value = pickle.load(f)
+    except (OSError, pickle.PickleError, EOFError):
+        return None
+
+    # mark as recently used
+    os.utime(path)
+    return value
+
+def store(namespace, key, value):
+    directory = os.path.join(CACHE, namespace)
+    os.makedirs(directory, exist_ok=True)
+
+    # write to a temporary file first, concurrent readers never see partial entries
+    path = get_path(namespace, key)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'wb') as f:
+        pickle.dump(value, f)
+    os.replace(tmp, path)
+
+    evict(directory)
+
+def evict(directory):
+    entries = [os.path.join(directory, name) for name in os.listdir(directory) if name.endswith(".pickle")]
+    if len(entries) <= MAX_ENTRIES:
+        return
+
+    entries.sort(key=lambda path: os.stat(path).st_mtime)
+    for path in entries[:len(entries) - MAX_ENTRIES]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+    logging.info(f"Evicted {len(entries) - MAX_ENTRIES} entries from {directory}")
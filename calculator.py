@@ -0,0 +1,124 @@
+import logging
+
+import numpy as np
+
+from collector import AssignmentData
+
+MAX_NODES = 100000 # search nodes per group of linked jobs, larger searches are left to the solver probes
+
+def get_eligible(data: AssignmentData, fixed=None):
+    # the only hard constraints of the item probes: a matching resource, and the kept resource of a fixed job
+    eligible = data.ranking > 0
+    for j, r in enumerate(fixed or []):
+        if r:
+            keep = eligible[r-1, j]
+            eligible[:, j] = False
+            eligible[r-1, j] = keep
+    return eligible
+
+def get_groups(data: AssignmentData):
+    # jobs linked by the ISO constraint (translation and revision of a workflow), in traversal order
+    neighbours = [set() for j in range(data.m)]
+    for j1 in range(data.m):
+        for succ in data.workflow[j1]["set"]:
+            if succ > 0 and data.jobtype[j1] == "TRA" and data.jobtype[succ-1] == "REV":
+                neighbours[j1].add(succ-1)
+                neighbours[succ-1].add(j1)
+
+    groups = []
+    seen = set()
+    for j in range(data.m):
+        if neighbours[j] and j not in seen:
+            group = [j]
+            seen.add(j)
+            for j1 in group:
+                for j2 in sorted(neighbours[j1] - seen):
+                    seen.add(j2)
+                    group.append(j2)
+            groups.append(group)
+    return groups, neighbours
+
+def get_minimum(group, neighbours, values, eligible, counted):
+    # exact minimum of the values of the counted jobs, linked jobs need different resources
+    # returns (resource per job or None if there is no valid assignment, False if the search was stopped)
+    # a job needs at most one candidate more than it has neighbours: one of them is always free
+    candidates = []
+    for j in group:
+        resources = np.flatnonzero(eligible[:, j])
+        if len(resources) == 0:
+            return None, True
+        column = values[resources, j] if counted[j] else np.zeros(len(resources))
+        order = np.argsort(column, kind="stable")[:len(neighbours[j])+1]
+        candidates.append([(float(column[o]), int(resources[o])) for o in order])
+
+    # lower bound of the jobs that are not yet assigned
+    bounds = np.append(np.cumsum([c[0][0] for c in candidates][::-1])[::-1], 0.0)
+
+    best = {"total": np.inf, "assigned": None}
+    assigned = {}
+    nodes = 0
+
+    def extend(p, total):
+        nonlocal nodes
+        nodes += 1
+        if nodes > MAX_NODES:
+            return False
+        if p == len(group):
+            best["total"], best["assigned"] = total, dict(assigned)
+            return True
+        j = group[p]
+        taken = {assigned[n] for n in neighbours[j] if n in assigned}
+        for value, r in candidates[p]:
+            if total + value + bounds[p+1] >= best["total"]:
+                break
+            if r in taken:
+                continue
+            assigned[j] = r
+            finished = extend(p+1, total + value)
+            del assigned[j]
+            if not finished:
+                return False
+        return True
+
+    if not extend(0, 0.0):
+        logging.info(f"Search over {len(group)} linked jobs stopped after {MAX_NODES} nodes")
+        return None, False
+    return best["assigned"], True
+
+def calculate(data: AssignmentData, iso, fixed=None):
+    # optimal values of the item probes without the solver: (objective value, margin of the item) for
+    # obj_costs and obj_quality of every item, in the order of the probes, None = left to the solver
+    probes = [None for p in range(2*data.k)]
+
+    eligible = get_eligible(data, fixed)
+    if not eligible.any(axis=0).all():
+        return probes
+
+    items = np.asarray(data.item) - 1
+    jobs = np.arange(data.m)
+    count = np.bincount(items, minlength=data.k)
+    groups, neighbours = get_groups(data) if iso else ([], None)
+
+    for o, values in enumerate((data.price, data.ranking)):
+        # without linked jobs every job takes its best eligible resource
+        choice = np.where(eligible, values, np.inf).argmin(axis=0)
+
+        # linked jobs are searched per item, jobs of other items only need to be assigned validly
+        unresolved = set()
+        for group in groups:
+            for i in sorted({items[j] for j in group}):
+                assigned, _ = get_minimum(group, neighbours, values, eligible, items == i)
+                if assigned is None:
+                    unresolved.add(i)
+                    continue
+                for j in group:
+                    if items[j] == i:
+                        choice[j] = assigned[j]
+
+        totals = np.bincount(items, weights=values[choice, jobs], minlength=data.k)
+        costs = np.bincount(items, weights=data.price[choice, jobs], minlength=data.k)
+        for i in range(data.k):
+            if i not in unresolved:
+                probes[2*i+o] = (float(totals[i] / count[i]), float((data.profit[i] - costs[i]) / data.profit[i]))
+
+    return probes
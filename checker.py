@@ -0,0 +1,52 @@
+import logging
+
+import numpy as np
+
+import calculator
+from collector import AssignmentData
+
+def get_unmatched(data: AssignmentData):
+    # jobs without any matching resource (the assertion of the model)
+    return [int(j) for j in np.flatnonzero(~(data.ranking > 0).any(axis=0))]
+
+def get_core(group, neighbours, eligible):
+    # a job with more eligible resources than linked jobs can always be assigned last,
+    # such jobs are removed until only the jobs that may conflict are left
+    core = set(group)
+    removed = True
+    while removed:
+        removed = False
+        for j in [j for j in group if j in core]:
+            if eligible[:, j].sum() > len(neighbours[j] & core):
+                core.remove(j)
+                removed = True
+    return [j for j in group if j in core]
+
+def get_iso_conflicts(data: AssignmentData, fixed=None):
+    # jobs that cannot get different resources for translation and revision of their workflow,
+    # [] if the ISO constraint can be met, None if the search was stopped (the solver has to decide)
+    eligible = calculator.get_eligible(data, fixed)
+    groups, neighbours = calculator.get_groups(data)
+
+    # nothing is counted, any valid assignment of a group will do
+    counted = np.zeros(data.m, dtype=bool)
+
+    conflicts = []
+    decided = True
+    for group in groups:
+        core = get_core(group, neighbours, eligible)
+        if not core:
+            continue
+        assigned, complete = calculator.get_minimum(core, neighbours, data.price, eligible, counted)
+        if not complete:
+            decided = False
+        elif assigned is None:
+            conflicts += core
+
+    logging.info(f"ISO check of {len(groups)} workflows: {len(conflicts)} conflicting jobs" + ("" if decided else ", some left undecided"))
+    if conflicts or decided:
+        return sorted(conflicts)
+    return None
+
+def get_names(data: AssignmentData, jobs):
+    return ", ".join(str(data.jobs[j]) for j in jobs)
@@ -1,12 +1,29 @@
-import json
-    
+import logging
+
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass, field
-from datetime import timedelta, date
+from datetime import datetime, timedelta, date
 from typing import List
 
-import dbconnector
+import numpy as np
 
-@dataclass
+import dbconnector
+import tracer
+
+# numeric fields that are stored as numpy arrays
+ARRAYS = {
+    "profit": np.float64,
+    "item_targets": np.float64,
+    "target_weights": np.int32,
+    "ranking_weights": np.int32,
+    "ranking": np.int32,
+    "price": np.int32,
+    "schedule": np.int32,
+    "planned": np.int32,
+    "day_weights": np.int32,
+}
+
+@dataclass(slots=True)
 class AssignmentData:
     n: int
     m: int
@@ -17,30 +34,40 @@ class AssignmentData:
     jobs: List = field(default_factory=list)
     items: List = field(default_factory=list)
 
-    profit: List = field(default_factory=list)
+    profit: np.ndarray = field(default_factory=list)
     item_constraints: List = field(default_factory=list)
-    item_targets: List = field(default_factory=list)
+    item_targets: np.ndarray = field(default_factory=list)
     target: float = 0.0
 
-    target_weights: List = field(default_factory=list)
-    ranking_weights: List = field(default_factory=list)
+    target_weights: np.ndarray = field(default_factory=list)
+    ranking_weights: np.ndarray = field(default_factory=list)
 
     jobtype: List = field(default_factory=list)
     workflow: List = field(default_factory=list)
     item: List = field(default_factory=list)
 
-    ranking: List = field(default_factory=list)
-    price: List = field(default_factory=list)
+    ranking: np.ndarray = field(default_factory=list)
+    price: np.ndarray = field(default_factory=list)
 
-    schedule: List = field(default_factory=list)
-    planned: List = field(default_factory=list)
+    schedule: np.ndarray = field(default_factory=list)
+    planned: np.ndarray = field(default_factory=list)
+
+    parallel: List = field(default_factory=list)
+    day_weights: np.ndarray = field(default_factory=list) # number of days per entry of DAY
 
     def __post_init__(self):
         self.workflow = [{"set": [-1]} for i in range(self.m)]
-        self.ranking = [[] for i in range(self.n)] 
-        self.price = [[] for i in range(self.n)] 
-        self.schedule = [[] for i in range(self.n)]
-        self.planned = [[0 for x in range(self.l)] for i in range(self.m)]
+        self.ranking = np.zeros((self.n, self.m), dtype=np.int32)
+        self.price = np.zeros((self.n, self.m), dtype=np.int32)
+        self.schedule = np.zeros((self.n, self.l), dtype=np.int32)
+        self.planned = np.zeros((self.m, self.l), dtype=np.int32)
+        self.day_weights = np.ones(self.l, dtype=np.int32)
+
+    def __setattr__(self, name, value):
+        # callers may still assign (nested) lists, they are converted to arrays
+        if name in ARRAYS:
+            value = np.asarray(value, dtype=ARRAYS[name])
+        object.__setattr__(self, name, value)
 
 @dataclass
 class Job:
@@ -53,6 +80,7 @@ class Job:
     start_date: date = 0
     end_date: date = None
     planned_time: int = None
+    successors: List = field(default_factory=list)
 
 def get_item_constraint(note):
     split = note.split("-")
@@ -108,15 +136,114 @@ def parse_price(price):
     else:
         return 0
 
-def get_data(order):
+def to_date(value):
+    return value.date() if isinstance(value, datetime) else value
+
+def build_schedule(resources, plans, order_start, days):
+    dates = np.datetime64(to_date(order_start), 'D') + np.arange(days)
+    weekdays = (order_start.weekday() + np.arange(days)) % 7 # weekday (0-6) of every day of the order
+
+    index = {resource: r for r, resource in enumerate(resources)}
+
+    # group the rows of every weekly plan into a weekday pattern
+    weekly = {}
+    for resource, plan, valid_from, valid_to, weekday, duration in plans:
+        if plan not in weekly:
+            weekly[plan] = (index[resource], to_date(valid_from), to_date(valid_to), np.zeros(7))
+        weekly[plan][3][weekday] += float(duration)
+
+    schedule = np.zeros((len(resources), days), dtype=np.int32)
 
+    # plans without validity range are the default, plans starting later override earlier ones
+    for r, valid_from, valid_to, pattern in sorted(weekly.values(), key=lambda p: (p[1] is not None, p[1] or date.min)):
+        valid = np.ones(days, dtype=bool)
+        if valid_from:
+            valid &= dates >= np.datetime64(valid_from, 'D')
+        if valid_to:
+            valid &= dates <= np.datetime64(valid_to, 'D')
+
+        minutes = np.rint(pattern * 30) # 1 Dauer is 0.5 hours -> 30 minutes
+        schedule[r, valid] = minutes[weekdays[valid]]
+
+    return schedule
+
+def get_parallel_pairs(planned):
+    # two jobs run in parallel if they are planned on exactly the same days
+    active = np.asarray(planned) > 0
+    if len(active) < 2:
+        return []
+
+    _, groups = np.unique(active, axis=0, return_inverse=True)
+    groups = groups.ravel()
+
+    pairs = []
+    for group in np.unique(groups):
+        jobs = np.flatnonzero(groups == group) + 1 # minizinc index starts with 1
+        if len(jobs) > 1:
+            j1, j2 = np.triu_indices(len(jobs), 1)
+            pairs.append(np.column_stack((jobs[j1], jobs[j2])))
+
+    return np.concatenate(pairs).tolist() if pairs else []
+
+def get_item_data(order):
     items = dbconnector.get_items(order)
+
+    # get item price (profit) and item note, that constains item target profit margin and weightings
+    profit = [dbconnector.get_item_price(it) for it in items]
+    notes = [dbconnector.get_item_note(it) for it in items]
+
+    return items, profit, notes
+
+def get_job_objects(order):
     jobs = dbconnector.get_jobs(order)
-    resources = dbconnector.get_results_of_jobs(order)
+    job_data = dbconnector.get_job_data(order)
+    successors = dbconnector.get_successors_of_order(order)
+
+    job_objects = []
+    for i, job_id in enumerate(jobs):
+        jobtype, item_index, start_date, end_date, planned_time = job_data[job_id]
+        job_objects.append(Job(job_id, i, item_index, jobtype, 0, start_date, end_date, planned_time, successors.get(job_id, [])))
+
+    return job_objects
+
+def get_schedule(resources, order_start, days, plans=None):
+    # get working minutes of every resource for every day from their weekly schedules
+    if plans is None:
+        return build_schedule(resources, dbconnector.get_weekly_plans(resources), order_start, days)
+
+    # plans: weekly plan rows per resource, shared between the orders of a batch
+    missing = [resource for resource in resources if resource not in plans]
+    if missing:
+        rows = {resource: [] for resource in missing}
+        for row in dbconnector.get_weekly_plans(missing):
+            rows[row[0]].append(row)
+        plans.update(rows)
+
+    return build_schedule(resources, [row for resource in resources for row in plans[resource]], order_start, days)
+
+def get_data(order, plans=None):
+
+    # independent blocks are fetched concurrently on separate pooled connections
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        item_block = executor.submit(tracer.wrap(get_item_data, "items"), order)
+        job_block = executor.submit(tracer.wrap(get_job_objects, "jobs"), order)
+        result_block = executor.submit(tracer.wrap(dbconnector.get_results_of_order, "results"), order)
+
+        resources = dbconnector.get_results_of_jobs(order)
+        order_start = dbconnector.get_order_startdate(order)
+        order_end = dbconnector.get_order_enddate(order)
+        days = (order_end - order_start).days # number of days between start and end date
 
-    order_start = dbconnector.get_order_startdate(order)
-    order_end = dbconnector.get_order_enddate(order)
-    days = (order_end - order_start).days # number of days between start and end date
+        schedule_block = executor.submit(tracer.wrap(get_schedule, "schedule"), resources, order_start, days, plans)
+
+        target = dbconnector.get_project_target(order)
+
+        items, profit, notes = item_block.result()
+        job_objects = job_block.result()
+        results = result_block.result()
+        schedule = schedule_block.result()
+
+    jobs = [job.id for job in job_objects]
     
     # create data object with dimensions
     data = AssignmentData(len(resources),len(jobs),len(items),days)
@@ -125,59 +252,41 @@ def get_data(order):
     data.jobs = jobs
     data.items = items
 
-    data.target = dbconnector.get_project_target(order)
+    data.target = target
+    data.profit = profit
 
-    for it in items:
-        # get item price (profit)
-        data.profit.append(dbconnector.get_item_price(it))
+    # parse note (<constrained>-<target>-<weight>-<weight>)
+    notes = [note for note in notes if note]
+    data.item_constraints = [get_item_constraint(note) for note in notes]
+    data.item_targets = [get_item_target(note, order) for note in notes]
+    data.target_weights = [get_target_weight(note) for note in notes]
+    data.ranking_weights = [get_ranking_weight(note) for note in notes]
 
-        # get item note, that constains item target profit margin and weightings
-        note = dbconnector.get_item_note(it)
+    data.schedule = schedule
 
-        # parse note (<constrained>-<target>-<weight>-<weight>)
-        if note:
-            data.item_constraints.append(get_item_constraint(note))
-            data.item_targets.append(get_item_target(note, order))
-            data.target_weights.append(get_target_weight(note))
-            data.ranking_weights.append(get_ranking_weight(note))
+    # number of queries the per job / per cell lookups would have needed
+    queries = 6 * len(jobs) + len(jobs) * len(resources) + 3 * len(results)
+    logging.info(f"Bulk loading saved {queries - 3} queries ({queries} per cell vs. 3 bulk queries)")
 
-    for r, resource in enumerate(resources):
-
-        # weekday (0-6) of order (start) date
-        weekday = order_start.weekday()
-        
-        for i in range(days):
-            # calculate weekday
-            weekday = weekday % 7
-
-            # get working hours / minutes of that resource for this weekday
-            # TODO does not consider the correct weekly schedule yet
-            working_hours = dbconnector.get_working_hours(resource, weekday)
-            minutes = round(working_hours * 60)
-
-            data.schedule[r].append(minutes)
-            weekday += 1
-
-    for i, job in enumerate(jobs):
+    for i, job in enumerate(job_objects):
 
         # get jobtype
-        data.jobtype.append(dbconnector.get_jobtype(job))
+        data.jobtype.append(job.jobtype)
 
         # get item
-        data.item.append(dbconnector.get_item_of_job(job))
+        data.item.append(job.item_index)
         
         # get workflow
-        successors = dbconnector.get_successors(job)
-        if successors:
+        if job.successors:
             # format sets for MiniZinc as dict --> "set": []
-            data.workflow[i]["set"] = [jobs.index(succ)+1 for succ in successors] # minizinc index starts with 1
+            data.workflow[i]["set"] = [jobs.index(succ)+1 for succ in job.successors] # minizinc index starts with 1
 
         # get planned time
-        pt = dbconnector.get_planned_time(job) / 1000 # in seconds
+        pt = job.planned_time / 1000 # in seconds
 
         # get start and end date
-        start = dbconnector.get_job_startdate(job)
-        end = dbconnector.get_job_enddate(job)
+        start = job.start_date
+        end = job.end_date
 
         if start.date() == end.date():
             delta = 1
@@ -199,18 +308,15 @@ def get_data(order):
         for j, resource in enumerate(resources):
 
             # check if resource is in results list
-            if dbconnector.is_result(job, resource):
-                data.ranking[j].append(dbconnector.get_rank(job, resource))
-                # TODO get price by job and resource instead of row
-                price = round(dbconnector.get_price(dbconnector.get_result_row(job, resource))) # rounded to int value
-                data.price[j].append(price)
-            else:
-                # resource is not in results list, set default values
-                data.ranking[j].append(0)
-                data.price[j].append(0)
+            # (resources that are not in the results list keep the default values 0)
+            if (job.id, resource) in results:
+                rank, price = results[(job.id, resource)]
+                data.ranking[j][i] = rank
+                data.price[j][i] = round(price) # rounded to int value
+
+    data.parallel = get_parallel_pairs(data.planned)
 
     # # create data file (optional)
-    # with open('data.json', 'w', encoding='utf-8') as f:
-    #     json.dump(data.__dict__, f, ensure_ascii=False, indent=4)
+    # minimizer.write_data(data, 'data.json')
 
     return data
\ No newline at end of file
@@ -0,0 +1,26 @@
+import copy
+import logging
+
+import numpy as np
+
+from collector import AssignmentData
+
+def compress(data: AssignmentData) -> AssignmentData:
+    # consecutive days with identical planned and schedule profiles are merged into one weighted bucket
+    if data.l == 0:
+        return data
+
+    profiles = np.vstack([data.planned, data.schedule])
+    changes = np.flatnonzero(np.any(profiles[:, 1:] != profiles[:, :-1], axis=0)) + 1
+    starts = np.concatenate(([0], changes))
+    # the input may already be weighted, a bucket weighs as much as its days together
+    weights = np.add.reduceat(data.day_weights, starts)
+
+    compressed = copy.copy(data)
+    compressed.l = len(starts)
+    compressed.planned = data.planned[:, starts]
+    compressed.schedule = data.schedule[:, starts]
+    compressed.day_weights = weights
+
+    logging.info(f"Planning horizon compressed from {data.l} days to {compressed.l} buckets")
+    return compressed
@@ -1,156 +1,260 @@
 import logging
+import threading
 import mysql.connector
-from mysql.connector import errorcode
+from contextlib import contextmanager
+from mysql.connector import errorcode, pooling
 
 import config as cfg
+import profiler
+import tracer
 
-# connect to database
-try:
-    db = mysql.connector.connect(**cfg.db)
-except mysql.connector.Error as err:
-  if err.errno == errorcode.ER_ACCESS_DENIED_ERROR:
-    logging.error("Something is wrong with your user name or password")
-  elif err.errno == errorcode.ER_BAD_DB_ERROR:
-    logging.error("Database does not exist")
-  else:
-    logging.error(err)
+POOL_SIZE = getattr(cfg, "pool_size", 8) # max. number of concurrent connections (mysql allows up to 32)
 
-cursor = db.cursor()
+pool = None
+pool_lock = threading.Lock()
+pool_slots = threading.BoundedSemaphore(POOL_SIZE)
+
+def get_pool():
+    global pool
+
+    # connect to database on first use
+    with pool_lock:
+        if pool is None:
+            try:
+                pool = pooling.MySQLConnectionPool(pool_name="optimizer", pool_size=POOL_SIZE, **cfg.db)
+            except mysql.connector.Error as err:
+                if err.errno == errorcode.ER_ACCESS_DENIED_ERROR:
+                    logging.error("Something is wrong with your user name or password")
+                elif err.errno == errorcode.ER_BAD_DB_ERROR:
+                    logging.error("Database does not exist")
+                else:
+                    logging.error(err)
+                raise
+    return pool
+
+@contextmanager
+def get_cursor(query):
+    # query: name of the calling function, the span of the query is named after it
+    # wait for a free connection instead of failing when the pool is exhausted
+    with tracer.span("db", query=query), pool_slots:
+        db = get_pool().get_connection()
+        try:
+            cursor = db.cursor()
+            try:
+                yield profiler.wrap(cursor) # opt-in query profiling
+            finally:
+                cursor.close()
+        finally:
+            db.close() # returns the connection to the pool
 
 def get_project_target(order_id):
-    cursor.execute("""
-                SELECT a.Zielrendite FROM auftrag a
-                WHERE a.AuftragID = %s;""", 
-                (order_id, ))
-    res = cursor.fetchall()
+    with get_cursor("get_project_target") as cursor:
+        cursor.execute("""
+                    SELECT a.Zielrendite FROM auftrag a
+                    WHERE a.AuftragID = %s;""", 
+                    (order_id, ))
+        res = cursor.fetchall()
     return res[0][0] / 100
 
 def is_iso_active(order_id):
-    cursor.execute("""
-                SELECT a.EN15038Konform_Soll FROM auftrag a
-                WHERE a.AuftragID = %s;""", 
-                (order_id, ))
-    res = cursor.fetchall()
+    with get_cursor("is_iso_active") as cursor:
+        cursor.execute("""
+                    SELECT a.EN15038Konform_Soll FROM auftrag a
+                    WHERE a.AuftragID = %s;""", 
+                    (order_id, ))
+        res = cursor.fetchall()
     return True if res[0][0] > 0 else False
 
 def get_items(order_id):
-    cursor.execute("""
-                SELECT ap.PositionID FROM auftragposition ap
-                WHERE ap.IDMain = %s;""", 
-                (order_id, ))
-    res = cursor.fetchall()
+    with get_cursor("get_items") as cursor:
+        cursor.execute("""
+                    SELECT ap.PositionID FROM auftragposition ap
+                    WHERE ap.IDMain = %s;""", 
+                    (order_id, ))
+        res = cursor.fetchall()
     return [i[0] for i in res]
 
 def get_jobs(order_id):
-    cursor.execute("""
-                SELECT j.JobID FROM job j
-                INNER JOIN auftrag a ON a.AuftragID = j.IDAuftrag 
-                WHERE a.AuftragID = %s;""", 
-                (order_id, ))
-    res = cursor.fetchall()
+    with get_cursor("get_jobs") as cursor:
+        cursor.execute("""
+                    SELECT j.JobID FROM job j
+                    INNER JOIN auftrag a ON a.AuftragID = j.IDAuftrag 
+                    WHERE a.AuftragID = %s;""", 
+                    (order_id, ))
+        res = cursor.fetchall()
     return [i[0] for i in res]
 
 def get_jobtype(job_id):
-    cursor.execute("""
-                SELECT j.Kurzform FROM job j
-                WHERE j.JobID = %s;""", 
-                (job_id, ))
-    res = cursor.fetchall()
+    with get_cursor("get_jobtype") as cursor:
+        cursor.execute("""
+                    SELECT j.Kurzform FROM job j
+                    WHERE j.JobID = %s;""", 
+                    (job_id, ))
+        res = cursor.fetchall()
     return res[0][0]
 
 def get_job_startdate(job_id):
-    cursor.execute("""
-                SELECT j.TerminVon FROM job j
-                WHERE j.JobID = %s;""", 
-                (job_id, ))
-    res = cursor.fetchall()
+    with get_cursor("get_job_startdate") as cursor:
+        cursor.execute("""
+                    SELECT j.TerminVon FROM job j
+                    WHERE j.JobID = %s;""", 
+                    (job_id, ))
+        res = cursor.fetchall()
     return res[0][0]
 
 def get_job_enddate(job_id):
-    cursor.execute("""
-                SELECT j.TerminBis FROM job j
-                WHERE j.JobID = %s;""", 
-                (job_id, ))
-    res = cursor.fetchall()
+    with get_cursor("get_job_enddate") as cursor:
+        cursor.execute("""
+                    SELECT j.TerminBis FROM job j
+                    WHERE j.JobID = %s;""", 
+                    (job_id, ))
+        res = cursor.fetchall()
     return res[0][0]
 
 def get_order_startdate(order_id):
-    cursor.execute("""
-                SELECT a.AuftragsDatum FROM auftrag a
-                WHERE a.AuftragID = %s;""", 
-                (order_id, ))
-    res = cursor.fetchall()
+    with get_cursor("get_order_startdate") as cursor:
+        cursor.execute("""
+                    SELECT a.AuftragsDatum FROM auftrag a
+                    WHERE a.AuftragID = %s;""", 
+                    (order_id, ))
+        res = cursor.fetchall()
     return res[0][0]
 
 def get_order_enddate(order_id):
-    cursor.execute("""
-                SELECT a.LieferDatum FROM auftrag a
-                WHERE a.AuftragID = %s;""", 
-                (order_id, ))
-    res = cursor.fetchall()
+    with get_cursor("get_order_enddate") as cursor:
+        cursor.execute("""
+                    SELECT a.LieferDatum FROM auftrag a
+                    WHERE a.AuftragID = %s;""", 
+                    (order_id, ))
+        res = cursor.fetchall()
     return res[0][0]
 
 def get_working_hours(resource_id, weekday):
-    cursor.execute("""
-                SELECT Dauer FROM mitarbeiterwochenplanzeitraum mwpz
-                INNER JOIN mitarbeiterwochenplan mwp ON mwpz.WochenplanID = mwp.MitarbeiterWochenplanID
-                WHERE mwp.PartnerID = %s AND mwpz.Wochentag = %s""", 
-                (resource_id, weekday))
-    res = cursor.fetchall()
+    with get_cursor("get_working_hours") as cursor:
+        cursor.execute("""
+                    SELECT Dauer FROM mitarbeiterwochenplanzeitraum mwpz
+                    INNER JOIN mitarbeiterwochenplan mwp ON mwpz.WochenplanID = mwp.MitarbeiterWochenplanID
+                    WHERE mwp.PartnerID = %s AND mwpz.Wochentag = %s""", 
+                    (resource_id, weekday))
+        res = cursor.fetchall()
     return res[0][0] / 2 if res else 0 # 1 Dauer is 0.5 hours -> working hours = Dauer / 2
 
+def get_weekly_plans(resource_ids):
+    if not resource_ids:
+        return []
+    placeholders = ", ".join(["%s"] * len(resource_ids))
+    with get_cursor("get_weekly_plans") as cursor:
+        cursor.execute(f"""
+                    SELECT mwp.PartnerID, mwp.MitarbeiterWochenplanID, mwp.GueltigVon, mwp.GueltigBis, mwpz.Wochentag, mwpz.Dauer 
+                    FROM mitarbeiterwochenplanzeitraum mwpz
+                    INNER JOIN mitarbeiterwochenplan mwp ON mwpz.WochenplanID = mwp.MitarbeiterWochenplanID
+                    WHERE mwp.PartnerID IN ({placeholders});""", 
+                    tuple(resource_ids))
+        res = cursor.fetchall()
+    # (resource id, plan id, valid from, valid to, weekday, Dauer)
+    return res
+
 def get_item_of_job(job_id):
-    cursor.execute("""
-                SELECT ap.PositionsNr FROM auftragposition ap
-                INNER JOIN job j ON j.IDPosition = ap.PositionID
-                WHERE j.JobID = %s;""", 
-                (job_id, ))
-    res = cursor.fetchall()
+    with get_cursor("get_item_of_job") as cursor:
+        cursor.execute("""
+                    SELECT ap.PositionsNr FROM auftragposition ap
+                    INNER JOIN job j ON j.IDPosition = ap.PositionID
+                    WHERE j.JobID = %s;""", 
+                    (job_id, ))
+        res = cursor.fetchall()
     return round(res[0][0] / 10)
 
 def get_item_price(item_id):
-    cursor.execute("""
-                    SELECT SUM(apz.Umfang * apz.PreisProEinheit) FROM auftragposzeilenpreis apz
-                    INNER JOIN auftragposition ap ON apz.IDPosition = ap.PositionID
-                    WHERE ap.PositionID = %s;""", 
-                    (item_id, ))
-    res = cursor.fetchall()
+    with get_cursor("get_item_price") as cursor:
+        cursor.execute("""
+                        SELECT SUM(apz.Umfang * apz.PreisProEinheit) FROM auftragposzeilenpreis apz
+                        INNER JOIN auftragposition ap ON apz.IDPosition = ap.PositionID
+                        WHERE ap.PositionID = %s;""", 
+                        (item_id, ))
+        res = cursor.fetchall()
     return res[0][0]
 
 def get_item_note(item_id):
-    cursor.execute("""
-                    SELECT Bemerkung FROM auftragposition ap
-                    WHERE ap.PositionID = %s;""", 
-                    (item_id, ))
-    res = cursor.fetchall()
+    with get_cursor("get_item_note") as cursor:
+        cursor.execute("""
+                        SELECT Bemerkung FROM auftragposition ap
+                        WHERE ap.PositionID = %s;""", 
+                        (item_id, ))
+        res = cursor.fetchall()
     return res[0][0] if res else None
 
 def get_planned_time(job_id):
-    cursor.execute("""
-                    SELECT SUM(jp.Umfang * jp.ZeitProEinheitDouble) FROM jobpreis jp
-                    WHERE jp.JobID = %s;""", 
-                    (job_id, ))
-    res = cursor.fetchall()
+    with get_cursor("get_planned_time") as cursor:
+        cursor.execute("""
+                        SELECT SUM(jp.Umfang * jp.ZeitProEinheitDouble) FROM jobpreis jp
+                        WHERE jp.JobID = %s;""", 
+                        (job_id, ))
+        res = cursor.fetchall()
     return res[0][0] if res[0][0] else 0
 
+def get_job_data(order_id):
+    with get_cursor("get_job_data") as cursor:
+        cursor.execute("""
+                    SELECT j.JobID, j.Kurzform, ap.PositionsNr, j.TerminVon, j.TerminBis,
+                    (SELECT SUM(jp.Umfang * jp.ZeitProEinheitDouble) FROM jobpreis jp WHERE jp.JobID = j.JobID)
+                    FROM job j
+                    INNER JOIN auftragposition ap ON j.IDPosition = ap.PositionID
+                    WHERE j.IDAuftrag = %s;""", 
+                    (order_id, ))
+        res = cursor.fetchall()
+    # job id -> (jobtype, item, start date, end date, planned time)
+    return {r[0]: (r[1], round(r[2] / 10), r[3], r[4], r[5] if r[5] else 0) for r in res}
+
+def get_successors_of_order(order_id):
+    with get_cursor("get_successors_of_order") as cursor:
+        cursor.execute("""
+                    SELECT jna.JobketteItemID, jna.NextJobketteItemID FROM jobkettenachfolger_auftrag jna
+                    INNER JOIN job j ON jna.JobketteItemID = j.JobID
+                    WHERE j.IDAuftrag = %s;""", 
+                    (order_id, ))
+        res = cursor.fetchall()
+    successors = {}
+    for job_id, successor in res:
+        successors.setdefault(job_id, []).append(successor)
+    return successors
+
+def get_results_of_order(order_id):
+    with get_cursor("get_results_of_order") as cursor:
+        cursor.execute("""
+                    SELECT j.JobID, rsrr.resource_id, rsrr.rank, rsrrrr.price_value FROM round_search_result_row rsrr
+                    INNER JOIN round r ON rsrr.round_round_id = r.round_id
+                    INNER JOIN job j ON r.job_id = j.JobID
+                    LEFT JOIN round_search_result_row_ranking rsrrrr 
+                        ON rsrrrr.round_search_result_row_round_search_result_row_id = rsrr.round_search_result_row_id
+                    WHERE j.IDAuftrag = %s AND r.current_round = 1 ORDER BY rsrr.round_search_result_row_id ASC;""", 
+                    (order_id, ))
+        res = cursor.fetchall()
+    # (job id, resource id) -> (rank, price), the first result row wins like in get_result_row
+    results = {}
+    for job_id, resource_id, rank, price in res:
+        results.setdefault((job_id, resource_id), (rank, price if price else 0))
+    return results
+
 def get_results_of_jobs(order_id):
-    cursor.execute("""
-                SELECT DISTINCT(rsrr.resource_id) FROM round_search_result_row rsrr
-                INNER JOIN round r ON rsrr.round_round_id = r.round_id
-                INNER JOIN job j ON r.job_id = j.JobID
-                INNER JOIN auftrag a ON j.IDAuftrag = a.AuftragID
-                WHERE a.AuftragID = %s AND r.current_round = 1 ORDER BY rsrr.resource_id ASC;""", 
-                (order_id, ))
-    res = cursor.fetchall()
+    with get_cursor("get_results_of_jobs") as cursor:
+        cursor.execute("""
+                    SELECT DISTINCT(rsrr.resource_id) FROM round_search_result_row rsrr
+                    INNER JOIN round r ON rsrr.round_round_id = r.round_id
+                    INNER JOIN job j ON r.job_id = j.JobID
+                    INNER JOIN auftrag a ON j.IDAuftrag = a.AuftragID
+                    WHERE a.AuftragID = %s AND r.current_round = 1 ORDER BY rsrr.resource_id ASC;""", 
+                    (order_id, ))
+        res = cursor.fetchall()
     return [i[0] for i in res]
 
 def get_resource_name(resource_id, length):
 
-    cursor.execute("""
-                SELECT m.Vorname, m.Nachname FROM mitarbeiter m
-                WHERE m.MitarbeiterID = %s;""", 
-                (resource_id, ))
-    res = cursor.fetchall()
+    with get_cursor("get_resource_name") as cursor:
+        cursor.execute("""
+                    SELECT m.Vorname, m.Nachname FROM mitarbeiter m
+                    WHERE m.MitarbeiterID = %s;""", 
+                    (resource_id, ))
+        res = cursor.fetchall()
 
     if length == "first":
         return res[0][0]
@@ -162,60 +266,66 @@ def get_resource_name(resource_id, length):
         print("Error")
 
 def get_successors(job_id):
-    cursor.execute("""
-                SELECT jna.NextJobketteItemID FROM jobkettenachfolger_auftrag jna
-                WHERE jna.JobketteItemID = %s;""", 
-                (job_id, ))
-    res = cursor.fetchall()
+    with get_cursor("get_successors") as cursor:
+        cursor.execute("""
+                    SELECT jna.NextJobketteItemID FROM jobkettenachfolger_auftrag jna
+                    WHERE jna.JobketteItemID = %s;""", 
+                    (job_id, ))
+        res = cursor.fetchall()
     return [r[0] for r in res]
 
 def is_result(job_id, resource_id):
-    cursor.execute("""
-                SELECT EXISTS(SELECT rsrr.round_search_result_row_id FROM round_search_result_row rsrr 
-                INNER JOIN round r ON rsrr.round_round_id = r.round_id
-                INNER JOIN job j ON r.job_id = j.JobID
-                WHERE j.JobID = %s AND rsrr.resource_id = %s AND r.current_round = 1);""", 
-                (job_id, resource_id))
-    res = cursor.fetchall()
+    with get_cursor("is_result") as cursor:
+        cursor.execute("""
+                    SELECT EXISTS(SELECT rsrr.round_search_result_row_id FROM round_search_result_row rsrr 
+                    INNER JOIN round r ON rsrr.round_round_id = r.round_id
+                    INNER JOIN job j ON r.job_id = j.JobID
+                    WHERE j.JobID = %s AND rsrr.resource_id = %s AND r.current_round = 1);""", 
+                    (job_id, resource_id))
+        res = cursor.fetchall()
     return res[0][0]
 
 def get_result_row(job_id, resource_id):
-    cursor.execute("""
-                SELECT rsrr.round_search_result_row_id FROM round_search_result_row rsrr 
-                INNER JOIN round r ON rsrr.round_round_id = r.round_id
-                INNER JOIN job j ON r.job_id = j.JobID
-                WHERE j.JobID = %s AND rsrr.resource_id = %s AND r.current_round = 1;""", 
-                (job_id, resource_id))
-    res = cursor.fetchall()
+    with get_cursor("get_result_row") as cursor:
+        cursor.execute("""
+                    SELECT rsrr.round_search_result_row_id FROM round_search_result_row rsrr 
+                    INNER JOIN round r ON rsrr.round_round_id = r.round_id
+                    INNER JOIN job j ON r.job_id = j.JobID
+                    WHERE j.JobID = %s AND rsrr.resource_id = %s AND r.current_round = 1;""", 
+                    (job_id, resource_id))
+        res = cursor.fetchall()
     return res[0][0]
 
 def get_current_round(job_id):
-    cursor.execute("""
-                SELECT r.round_id FROM round r
-                INNER JOIN job j ON r.job_id = j.JobID
-                WHERE j.JobID = %s AND r.current_round = 1;""", 
-                (job_id, ))
-    res = cursor.fetchall()
+    with get_cursor("get_current_round") as cursor:
+        cursor.execute("""
+                    SELECT r.round_id FROM round r
+                    INNER JOIN job j ON r.job_id = j.JobID
+                    WHERE j.JobID = %s AND r.current_round = 1;""", 
+                    (job_id, ))
+        res = cursor.fetchall()
     return res[0][0]
 
 def get_rank(job_id, resource_id):
-    cursor.execute("""
-                SELECT rsrr.rank FROM round_search_result_row rsrr 
-                INNER JOIN round r ON rsrr.round_round_id = r.round_id
-                INNER JOIN job j ON r.job_id = j.JobID
-                WHERE j.JobID = %s AND rsrr.resource_id = %s AND r.current_round = 1;""", 
-                (job_id, resource_id))
-    res = cursor.fetchall()
+    with get_cursor("get_rank") as cursor:
+        cursor.execute("""
+                    SELECT rsrr.rank FROM round_search_result_row rsrr 
+                    INNER JOIN round r ON rsrr.round_round_id = r.round_id
+                    INNER JOIN job j ON r.job_id = j.JobID
+                    WHERE j.JobID = %s AND rsrr.resource_id = %s AND r.current_round = 1;""", 
+                    (job_id, resource_id))
+        res = cursor.fetchall()
     return res[0][0]
 
 def get_busy(job_id, resource_id):
-    cursor.execute("""
-                SELECT rsrr.busy FROM round_search_result_row rsrr 
-                INNER JOIN round r ON rsrr.round_round_id = r.round_id
-                INNER JOIN job j ON r.job_id = j.JobID
-                WHERE j.JobID = %s AND rsrr.resource_id = %s AND r.current_round = 1;""", 
-                (job_id, resource_id))
-    res = cursor.fetchall()
+    with get_cursor("get_busy") as cursor:
+        cursor.execute("""
+                    SELECT rsrr.busy FROM round_search_result_row rsrr 
+                    INNER JOIN round r ON rsrr.round_round_id = r.round_id
+                    INNER JOIN job j ON r.job_id = j.JobID
+                    WHERE j.JobID = %s AND rsrr.resource_id = %s AND r.current_round = 1;""", 
+                    (job_id, resource_id))
+        res = cursor.fetchall()
     return res[0][0]
 
 # deprecated
@@ -229,25 +339,28 @@ def get_busy(job_id, resource_id):
 #     return res[0][0] if res else 0
 
 def get_price(row_id):
-    cursor.execute("""
-                SELECT rsrrrr.price_value from round_search_result_row_ranking rsrrrr 
-                WHERE rsrrrr.round_search_result_row_round_search_result_row_id = %s;""", 
-                (row_id, ))
-    res = cursor.fetchall()
+    with get_cursor("get_price") as cursor:
+        cursor.execute("""
+                    SELECT rsrrrr.price_value from round_search_result_row_ranking rsrrrr 
+                    WHERE rsrrrr.round_search_result_row_round_search_result_row_id = %s;""", 
+                    (row_id, ))
+        res = cursor.fetchall()
     return res[0][0] if res else 0
 
 def get_price_currency(row_id):
-    cursor.execute("""
-                SELECT rsrrrm.price_unit from round_search_result_row_ranking rsrrrr 
-                WHERE rsrrrr.round_search_result_row_round_search_result_row_id = %s;""", 
-                (row_id, ))
-    res = cursor.fetchall()
+    with get_cursor("get_price_currency") as cursor:
+        cursor.execute("""
+                    SELECT rsrrrm.price_unit from round_search_result_row_ranking rsrrrr 
+                    WHERE rsrrrr.round_search_result_row_round_search_result_row_id = %s;""", 
+                    (row_id, ))
+        res = cursor.fetchall()
     return res[0][0] if res else None    
 
 def is_target_profit_margin_active():
-    cursor.execute("""
-                SELECT ses.boolean_value from system_einstellung_system ses 
-                WHERE ses.system_einstellung_key = 'VerhindereUnterschreitenZielrendite';""", 
-                ())
-    res = cursor.fetchall()
+    with get_cursor("is_target_profit_margin_active") as cursor:
+        cursor.execute("""
+                    SELECT ses.boolean_value from system_einstellung_system ses 
+                    WHERE ses.system_einstellung_key = 'VerhindereUnterschreitenZielrendite';""", 
+                    ())
+        res = cursor.fetchall()
     return True if res[0][0] > 0 else False
\ No newline at end of file
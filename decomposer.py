@@ -0,0 +1,253 @@
+import os
+import math
+import time
+import logging
+import multiprocessing
+
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import config as cfg
+import calculator
+import minimizer
+import tracer
+from collector import AssignmentData
+
+DECOMPOSE = getattr(cfg, "decompose", True) # solve independent parts of an order separately
+PROCESSES = getattr(cfg, "decompose_processes", os.cpu_count() or 1) # max. number of parts solved at the same time
+
+# worst status of the parts first, it becomes the status of the order
+SEVERITY = [minimizer.AssignmentStatus.ERROR, minimizer.AssignmentStatus.UNSATISFIABLE, minimizer.AssignmentStatus.ALTERNATIVE,
+            minimizer.AssignmentStatus.FEASIBLE, minimizer.AssignmentStatus.OPTIMAL]
+
+def get_components(data: AssignmentData, iso):
+    # jobs interact if they belong to the same item (item objective and margin), may take the same resource
+    # on the same day (capacity), are running in parallel or form a TRA/REV pair of a workflow (ISO)
+    parent = list(range(data.m))
+
+    def find(j):
+        while parent[j] != j:
+            parent[j] = parent[parent[j]]
+            j = parent[j]
+        return j
+
+    def link(jobs):
+        roots = [find(j) for j in jobs]
+        for root in roots[1:]:
+            parent[root] = roots[0]
+
+    items = np.asarray(data.item)
+    for i in range(data.k):
+        link(np.flatnonzero(items == i+1))
+
+    eligible = data.ranking > 0
+    active = data.planned > 0
+    for r in range(data.n):
+        jobs = np.flatnonzero(eligible[r])
+        for d in np.flatnonzero(active[jobs].sum(axis=0) > 1):
+            link(jobs[active[jobs, d]])
+
+    if len(data.parallel):
+        pairs = np.asarray(data.parallel) - 1 # minizinc index 1..m vs. 0..m-1
+        shared = (eligible[:, pairs[:, 0]] & eligible[:, pairs[:, 1]]).any(axis=0)
+        for j1, j2 in pairs[shared]:
+            link([j1, j2])
+
+    if iso:
+        groups, neighbours = calculator.get_groups(data)
+        for group in groups:
+            link(group)
+
+    components = {}
+    for j in range(data.m):
+        components.setdefault(find(j), []).append(j)
+    return list(components.values())
+
+def get_part(data: AssignmentData, jobs):
+    # problem instance of a component, restricted to its items and the resources eligible for its jobs
+    items = sorted({data.item[j]-1 for j in jobs})
+    resources = np.flatnonzero((data.ranking[:, jobs] > 0).any(axis=1))
+    position = {j: p for p, j in enumerate(jobs)}
+    index = {i: p for p, i in enumerate(items)}
+
+    part = AssignmentData(len(resources), len(jobs), len(items), data.l)
+    part.resources = [data.resources[r] for r in resources]
+    part.jobs = [data.jobs[j] for j in jobs]
+    part.items = [data.items[i] for i in items]
+
+    part.target = data.target
+    part.profit = data.profit[items]
+    part.item_constraints = [data.item_constraints[i] for i in items]
+    part.item_targets = data.item_targets[items]
+    part.target_weights = data.target_weights[items]
+    part.ranking_weights = data.ranking_weights[items]
+
+    part.jobtype = [data.jobtype[j] for j in jobs]
+    part.item = [index[data.item[j]-1]+1 for j in jobs]
+    for p, j in enumerate(jobs):
+        successors = [position[succ-1]+1 for succ in data.workflow[j]["set"] if succ-1 in position]
+        part.workflow[p]["set"] = successors or [-1]
+
+    part.ranking = data.ranking[np.ix_(resources, jobs)]
+    part.price = data.price[np.ix_(resources, jobs)]
+    part.schedule = data.schedule[resources]
+    part.planned = data.planned[jobs]
+    part.day_weights = data.day_weights
+    part.parallel = [[position[j1-1]+1, position[j2-1]+1] for j1, j2 in data.parallel if j1-1 in position and j2-1 in position]
+
+    return part, items, resources
+
+def get_part_hint(hint, jobs, resources):
+    # resource indices of the order (1..n) -> resource indices of the part, 0 = no hint
+    if not hint:
+        return None
+    index = {r+1: p+1 for p, r in enumerate(resources)}
+    return [index.get(hint[j], 0) for j in jobs]
+
+def get_logging():
+    # the parts log to the file of the parent process
+    root = logging.getLogger()
+    handler = next((h for h in root.handlers if isinstance(h, logging.FileHandler)), None)
+    if handler is None:
+        return None
+    formatter = handler.formatter or logging.Formatter()
+    return {"filename": handler.baseFilename, "format": formatter._fmt, "datefmt": formatter.datefmt, "level": root.level}
+
+def init_process(config):
+    if config:
+        logging.basicConfig(**config)
+
+def get_executor(processes):
+    # spawned, not forked: the worker process runs threads that may hold locks (logging, connection pool)
+    return ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context("spawn"),
+                               initializer=init_process, initargs=(get_logging(),))
+
+def get_limit(budget, start, parts, processes):
+    # parts beyond <processes> run in later waves, every wave gets its share of the remaining budget
+    if not budget:
+        return None
+    waves = math.ceil(parts / processes)
+    return max(minimizer.MIN_LIMIT, (budget - (time.perf_counter() - start)) / waves)
+
+def solve_part(args):
+    # runs in a separate process, every part gets its own solver processes and its own result cache entry,
+    # its spans are returned with the result and attached to the trace of the order
+    with tracer.record("part", m=args[0].m) as span:
+        result = minimizer.solve(*args)
+        span.set(status=result.status.name)
+    return result, span
+
+def run(tasks, processes):
+    with get_executor(processes) as executor:
+        results = []
+        for result, span in executor.map(solve_part, tasks):
+            tracer.attach(span)
+            results.append(result)
+    return results
+
+def merge(data: AssignmentData, parts, results):
+    result = minimizer.AssignmentResult(data.k)
+    result.assignment = [0 for j in range(data.m)]
+    result.items = [None for i in range(data.k)]
+    result.objective_bound = 0.0
+
+    for (jobs, items, resources), res in zip(parts, results):
+        for p, j in enumerate(jobs):
+            result.assignment[j] = int(resources[res.assignment[p]-1]) + 1
+        for p, i in enumerate(items):
+            res.items[p].midx = i+1
+            result.items[i] = res.items[p]
+
+        result.objective += res.objective
+        result.objective_bound = None if result.objective_bound is None or res.objective_bound is None else result.objective_bound + res.objective_bound
+        result.proven &= res.proven
+        result.capacity_violations += res.capacity_violations
+        result.parallel_violations += res.parallel_violations
+
+        # parts run in parallel, the slowest part of each phase counts
+        for phase, seconds in res.timings.items():
+            result.timings[phase] = max(result.timings.get(phase, 0.0), seconds)
+
+    # items without jobs belong to no part
+    for i in range(data.k):
+        if result.items[i] is None:
+            result.items[i] = minimizer.ItemResult(i+1, data.item_constraints[i], data.item_targets[i], data.target_weights[i], data.ranking_weights[i])
+
+    costs = data.price[np.asarray(result.assignment) - 1, np.arange(data.m)].sum()
+    result.project_margin = float((data.profit.sum() - costs) / data.profit.sum())
+
+    # the worst part decides the status of the order
+    worst = min(results, key=lambda res: SEVERITY.index(res.status))
+    result.status, result.message = worst.status, worst.message
+
+    if result.objective_bound is not None:
+        result.optimality_gap = abs(result.objective - result.objective_bound) / max(abs(result.objective), 1e-9)
+    else:
+        result.optimality_gap = minimizer.get_gap(result)
+
+    return result
+
+def solve(data: AssignmentData, iso, target_active, budget=None, workers=minimizer.WORKERS, hint=None, use_cache=True, engine=minimizer.ENGINE):
+    # budget: wall-clock budget in seconds, None = minimizer.BUDGET
+    budget = minimizer.BUDGET if budget is None else budget
+    start = time.perf_counter()
+
+    with tracer.span("decomposition") as span:
+        components = get_components(data, iso) if DECOMPOSE else [list(range(data.m))]
+        span.set(components=len(components))
+        if len(components) < 2:
+            parts = []
+        else:
+            parts = [get_part(data, jobs) for jobs in components]
+    decomposition = time.perf_counter() - start
+
+    if not parts:
+        return minimizer.solve(data, iso, target_active, budget, workers, hint, use_cache, engine)
+
+    logging.info(f"Order decomposed into {len(parts)} independent parts with {[part.m for part, items, resources in parts]} jobs")
+
+    # the parts are solved without the project margin constraint, it is coordinated afterwards
+    processes = min(PROCESSES, len(parts))
+    limit = get_limit(budget, start, len(parts), processes)
+    tasks = [(part, iso, False, limit, max(1, workers // processes), get_part_hint(hint, jobs, resources), use_cache, engine)
+             for (part, items, resources), jobs in zip(parts, components)]
+    with tracer.span("parts", processes=processes):
+        results = run(tasks, processes)
+    parts = [(jobs, items, resources) for (part, items, resources), jobs in zip(parts, components)]
+
+    failed = [res for res in results if res.status in (minimizer.AssignmentStatus.ERROR, minimizer.AssignmentStatus.UNSATISFIABLE)]
+    if failed:
+        # the order as a whole fails the same way
+        result = failed[0]
+        result.k = data.k
+        result.timings = {"decomposition": decomposition, **result.timings}
+        return result
+
+    result = merge(data, parts, results)
+
+    if target_active and result.project_margin < data.target:
+        # coordination: the parts below the project target are solved again with the project margin constraint,
+        # reaching the target in every part is sufficient for the order
+        below = [p for p, res in enumerate(results) if res.project_margin < data.target]
+        logging.info(f"Project margin {round(result.project_margin, 4)} below target, {len(below)} parts solved again with the project margin constraint")
+        processes = min(PROCESSES, len(below))
+        limit = get_limit(budget, start, len(below), processes)
+        with tracer.span("coordination", parts=len(below)):
+            coordinated = run([tasks[p][:2] + (True, limit) + tasks[p][4:] for p in below], processes)
+
+        if any(res.status in (minimizer.AssignmentStatus.ERROR, minimizer.AssignmentStatus.UNSATISFIABLE) or res.project_margin < data.target
+               for res in coordinated):
+            # a part cannot reach the target on its own, the margin has to be balanced between the parts
+            logging.info("Project target not reached by every part on its own, full solve")
+            return minimizer.solve(data, iso, target_active, get_limit(budget, start, 1, 1), workers, hint, use_cache, engine)
+
+        for p, res in zip(below, coordinated):
+            results[p] = res
+        result = merge(data, parts, results)
+
+        # the target of every part is stricter than the target of the order, the merged result is not proven optimal
+        minimizer.set_feasible(result)
+
+    result.timings = {"decomposition": decomposition, **result.timings}
+    return result
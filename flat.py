@@ -0,0 +1,176 @@
+import os
+import re
+import logging
+import tempfile
+import subprocess
+
+from types import SimpleNamespace
+from minizinc import Instance, Result, Status, default_driver, error
+from minizinc.result import set_stat
+
+import config as cfg
+
+SOLVER = "cbc" # MIP solver
+MINIZINC = getattr(cfg, "minizinc", None) or (str(default_driver.executable) if default_driver else "minizinc")
+
+OBJECTIVE = "obj" # objective variable of the model, defined per solve
+FAILED = "constraint int_lin_le([], [], -1);" # 0 <= -1, a contradiction the linear solvers accept
+
+# output declarations of the flatzinc: scalars and arrays of variables or fixed values
+SCALAR = re.compile(r"^(?:var\s+)?[^:;]*:\s*(\w+)\s*::[^;=]*\boutput_var\b[^;=]*(?:=\s*([^;]+))?;", re.MULTILINE)
+ARRAY = re.compile(r"^array\s*\[[^\]]*\]\s*of\s+(?:var\s+)?[^:;]*:\s*(\w+)\s*::[^;=]*\boutput_array\b.*?=\s*\[([^\]]*)\]\s*;", re.MULTILINE)
+
+STATUS = {
+    "==========": Status.OPTIMAL_SOLUTION,
+    "=====UNSATISFIABLE=====": Status.UNSATISFIABLE,
+    "=====UNBOUNDED=====": Status.UNBOUNDED,
+    "=====UNSATorUNBOUNDED=====": Status.UNSATISFIABLE,
+    "=====UNKNOWN=====": Status.UNKNOWN,
+    "=====ERROR=====": Status.ERROR,
+}
+
+def parse_value(value):
+    value = value.strip()
+    if value.startswith("array"):
+        value = value[value.index("[")+1:value.rindex("]")]
+        return [parse_value(v) for v in value.split(",") if v.strip()]
+    if value in ("true", "false"):
+        return value == "true"
+    try:
+        return int(value)
+    except ValueError:
+        return float(value)
+
+def is_literal(element):
+    return not re.match(r"^[A-Za-z]", element)
+
+def get_float(value):
+    # flatzinc float literals need a decimal point or an exponent
+    value = repr(float(value))
+    return value if "." in value or "e" in value else value + ".0"
+
+class FlatModel:
+    # the flatzinc of one order: constraints and objectives of every solve are appended as flatzinc,
+    # the model is not flattened again
+
+    def __init__(self, fzn, statistics):
+        self.statistics = statistics
+
+        # the solve item is replaced for every solve
+        self.text = fzn[:fzn.rindex("\nsolve")+1] if "\nsolve" in fzn else fzn
+
+        self.scalars = {name: value for name, value in SCALAR.findall(self.text)}
+        self.arrays = {name: [e.strip() for e in elements.split(",")] for name, elements in ARRAY.findall(self.text)}
+
+        # fixed values of output variables are not printed by the solver
+        self.fixed = {name: parse_value(value) for name, value in self.scalars.items() if value and is_literal(value.strip())}
+        for name, elements in self.arrays.items():
+            if all(is_literal(e) for e in elements):
+                self.fixed[name] = [parse_value(e) for e in elements]
+
+    def get(self, name, i=None):
+        # flatzinc identifier or literal of a model variable (i: 0-based index)
+        if i is None:
+            value = self.scalars[name]
+            return value.strip() if value else name
+        return self.arrays[name][i]
+
+    def linear(self, terms, relation, rhs):
+        # sum(coefficient * variable) <relation> rhs over float variables, terms: [(coefficient, (name, index))]
+        coefficients, variables = [], []
+        for coefficient, (name, i) in terms:
+            element = self.get(name, i)
+            if is_literal(element):
+                rhs -= coefficient * float(element)
+            else:
+                coefficients.append(get_float(coefficient))
+                variables.append(element)
+        if not variables:
+            # only fixed values, the constraint holds or fails right away
+            holds = {"le": 0 <= rhs + 1e-9, "eq": abs(rhs) <= 1e-9}[relation]
+            return "" if holds else FAILED
+        return f"constraint float_lin_{relation}([{', '.join(coefficients)}], [{', '.join(variables)}], {get_float(rhs)});"
+
+    def at_least(self, name, i, value):
+        return self.linear([(-1.0, (name, i))], "le", -value)
+
+    def objective(self, terms):
+        # obj = sum(coefficient * variable)
+        return self.linear([(1.0, (OBJECTIVE, None))] + [(-c, v) for c, v in terms], "eq", 0.0)
+
+    def fix(self, name, i, value):
+        element = self.get(name, i)
+        if is_literal(element):
+            return "" if int(element) == value else FAILED
+        return f"constraint int_lin_eq([1], [{element}], {int(value)});"
+
+    def get_solve_item(self, hint):
+        # hint: 0-based job index -> resource (1..n) the solver should start from
+        variables, values = [], []
+        for j, r in (hint or {}).items():
+            element = self.get("assigned", j)
+            if not is_literal(element):
+                variables.append(element)
+                values.append(str(int(r)))
+        annotation = f" :: warm_start([{', '.join(variables)}], [{', '.join(values)}])" if variables else ""
+        return f"solve{annotation} minimize {self.get(OBJECTIVE)};\n"
+
+    def solve(self, constraints, hint=None, limit=None, label="search"):
+        # the flatzinc is passed to the solver directly, intermediate solutions are reported as they arrive
+        fd, path = tempfile.mkstemp(prefix="assign_", suffix=".fzn")
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(self.text)
+            f.write("\n".join(c for c in constraints if c) + "\n")
+            f.write(self.get_solve_item(hint))
+
+        cmd = [MINIZINC, "--solver", SOLVER, "--statistics", "--intermediate"]
+        if limit is not None:
+            cmd += ["--time-limit", str(int(limit.total_seconds() * 1000))]
+        cmd.append(path)
+
+        status, solution, statistics = Status.UNKNOWN, None, {}
+        values = {}
+        # stderr goes to a file, a full stderr pipe would block the solver while stdout is read
+        stderr = tempfile.TemporaryFile(mode='w+', encoding='utf-8')
+        try:
+            with subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=stderr, text=True) as proc:
+                for line in proc.stdout:
+                    line = line.strip()
+                    if line.startswith("%%%mzn-stat:"):
+                        match = re.match(r"%%%mzn-stat:? (\w*)=(.*)", line)
+                        if match:
+                            set_stat(statistics, match.group(1), match.group(2))
+                    elif line == "----------":
+                        solution = SimpleNamespace(**{**self.fixed, **values})
+                        solution.objective = getattr(solution, OBJECTIVE, None)
+                        status = Status.SATISFIED
+                        values = {}
+                        logging.info(f"{label}: intermediate solution with objective {solution.objective}")
+                    elif line in STATUS:
+                        status = STATUS[line]
+                    elif " = " in line and line.endswith(";"):
+                        name, value = line[:-1].split(" = ", 1)
+                        values[name.strip()] = parse_value(value)
+            stderr.seek(0)
+            message = stderr.read().strip()
+        finally:
+            stderr.close()
+            os.remove(path)
+
+        if proc.returncode != 0 or status == Status.ERROR:
+            raise error.MiniZincError(message=f"{label}: solver failed ({proc.returncode}): {message}")
+
+        return Result(status, solution, statistics)
+
+def flatten(model, solver, path, limit=None):
+    # assertions of the model (e.g. jobs without matching resource) fail here
+    instance = Instance(solver, model)
+    instance.add_file(path, parse_data=False)
+    with instance.flat(time_limit=limit) as (fzn, ozn, statistics):
+        with open(fzn.name, encoding='utf-8') as f:
+            text = f.read()
+
+    flat = FlatModel(text, statistics)
+    logging.info(f"Model flattened once in {statistics.get('flatTime')}: {len(text)} bytes, "
+                 f"{statistics.get('flatIntVars', 0) + statistics.get('flatFloatVars', 0) + statistics.get('flatBoolVars', 0)} variables")
+    return flat
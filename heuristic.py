@@ -0,0 +1,296 @@
+import time
+import logging
+
+import numpy as np
+
+import config as cfg
+import calculator
+import checker
+from collector import AssignmentData
+from results import AssignmentStatus, AssignmentResult, ItemResult, timed
+
+BUDGET = getattr(cfg, "heuristic_budget", 30) # wall-clock budget of the local search in seconds
+STALL = 20 # perturbations without a new best assignment before the search stops early
+SEED = 0 # fixed seed, identical instances get identical assignments
+
+PENALTY = 1000 # costs of a violated ISO pair or margin constraint, hard constraints dominate the objective
+MARGIN_PENALTY = 100000 # costs per unit of a missed target profit margin (1.0 = 100%)
+
+class State:
+    # assignment with the running totals that are needed to evaluate a move in O(days + neighbours)
+
+    def __init__(self, data: AssignmentData, iso, coef, item_targets, project_target, assigned):
+        self.data = data
+        self.coef = coef
+        self.item_targets = item_targets # None = no constraint for the item
+        self.project_target = project_target # None = no constraint for the project
+
+        self.days = [np.flatnonzero(data.planned[j]) for j in range(data.m)]
+        self.items = np.asarray(data.item) - 1
+
+        # jobs running in parallel, and TRA/REV pairs of a workflow if the ISO constraint is active
+        self.partners = [[] for j in range(data.m)]
+        for j1, j2 in data.parallel:
+            self.partners[j1-1].append(j2-1)
+            self.partners[j2-1].append(j1-1)
+        self.iso = [[] for j in range(data.m)]
+        if iso:
+            for j1 in range(data.m):
+                for succ in data.workflow[j1]["set"]:
+                    if succ > 0 and data.jobtype[j1] == "TRA" and data.jobtype[succ-1] == "REV":
+                        self.iso[j1].append(succ-1)
+                        self.iso[succ-1].append(j1)
+
+        self.assigned = np.array(assigned)
+        self.load = np.zeros((data.n, data.l), dtype=np.int64)
+        self.costs = np.zeros(data.k)
+        for j, r in enumerate(self.assigned):
+            self.load[r] += data.planned[j]
+            self.costs[self.items[j]] += data.price[r, j]
+
+        self.linear = float(sum(coef[r, j] for j, r in enumerate(self.assigned)))
+        self.parallel = sum(1 for j1, j2 in data.parallel if self.assigned[j1-1] == self.assigned[j2-1])
+        self.capacity = int(np.sum(data.day_weights * (data.schedule - self.load < 0)))
+        self.conflicts = sum(1 for j in range(data.m) for j2 in self.iso[j] if j < j2 and self.assigned[j] == self.assigned[j2])
+        self.shortfall = sum(self.get_shortfall(i) for i in range(data.k)) + self.get_project_shortfall()
+
+    def get_shortfall(self, i):
+        if self.item_targets[i] is None:
+            return 0.0
+        return max(0.0, self.item_targets[i] - self.get_margin(i))
+
+    def get_project_shortfall(self):
+        if self.project_target is None:
+            return 0.0
+        return max(0.0, self.project_target - self.get_project_margin())
+
+    def get_margin(self, i):
+        return (self.data.profit[i] - self.costs[i]) / self.data.profit[i]
+
+    def get_project_margin(self):
+        return (self.data.profit.sum() - self.costs.sum()) / self.data.profit.sum()
+
+    def get_objective(self):
+        # objective of the model, without penalties
+        return self.linear + self.parallel + self.capacity
+
+    def get_costs(self):
+        return self.get_objective() + PENALTY * self.conflicts + MARGIN_PENALTY * self.shortfall
+
+    def move(self, j, r):
+        # reassign job j to resource r, returns the change of the penalized costs
+        a = self.assigned[j]
+        if a == r:
+            return 0.0
+        data = self.data
+        before = self.get_costs()
+
+        days = self.days[j]
+        weights = data.day_weights[days]
+        planned = data.planned[j, days]
+        self.capacity -= int(np.sum(weights * (data.schedule[a, days] - self.load[a, days] < 0)))
+        self.capacity -= int(np.sum(weights * (data.schedule[r, days] - self.load[r, days] < 0)))
+        self.load[a, days] -= planned
+        self.load[r, days] += planned
+        self.capacity += int(np.sum(weights * (data.schedule[a, days] - self.load[a, days] < 0)))
+        self.capacity += int(np.sum(weights * (data.schedule[r, days] - self.load[r, days] < 0)))
+
+        self.parallel += sum(1 for j2 in self.partners[j] if self.assigned[j2] == r) - sum(1 for j2 in self.partners[j] if self.assigned[j2] == a)
+        self.conflicts += sum(1 for j2 in self.iso[j] if self.assigned[j2] == r) - sum(1 for j2 in self.iso[j] if self.assigned[j2] == a)
+
+        i = self.items[j]
+        self.shortfall -= self.get_shortfall(i) + self.get_project_shortfall()
+        self.costs[i] += data.price[r, j] - data.price[a, j]
+        self.shortfall += self.get_shortfall(i) + self.get_project_shortfall()
+
+        self.linear += self.coef[r, j] - self.coef[a, j]
+        self.assigned[j] = r
+
+        return self.get_costs() - before
+
+def get_bounds(data: AssignmentData, iso, fixed=None):
+    # optimal item costs and quality of the model's probes, values that could not be calculated with the
+    # ISO constraint and the fixed jobs are taken without them (they can only be better, and stay valid normalizations)
+    probes = calculator.calculate(data, iso, fixed)
+    if None in probes:
+        probes = [p if p is not None else q for p, q in zip(probes, calculator.calculate(data, False))]
+
+    optimal_costs = np.array([probes[2*i][0] for i in range(data.k)])
+    optimal_margin = np.array([probes[2*i][1] for i in range(data.k)])
+    optimal_quality = np.array([probes[2*i+1][0] for i in range(data.k)])
+
+    return optimal_costs, optimal_quality, optimal_margin
+
+def get_coefficients(data: AssignmentData, items, optimal_costs, optimal_quality):
+    # the weighted item objectives are linear in the assignment: one value per resource and job
+    idx = np.asarray(data.item) - 1
+    count = np.bincount(idx, minlength=data.k)
+    margin_weight = np.array([item.margin_weight for item in items], dtype=float)[idx]
+    quality_weight = np.array([item.quality_weight for item in items], dtype=float)[idx]
+
+    costs = margin_weight / (count[idx] * np.where(optimal_costs[idx] > 0, optimal_costs[idx], 1))
+    quality = quality_weight / (count[idx] * np.where(optimal_quality[idx] > 0, optimal_quality[idx], 1))
+    return data.price * costs + data.ranking * quality
+
+def get_start(data: AssignmentData, coef, eligible, hint, fixed):
+    # cheapest eligible resource per job, unless a (valid) hint or fixed resource is given
+    assigned = np.where(eligible, coef, np.inf).argmin(axis=0)
+    for source in (hint, fixed):
+        if source:
+            for j, r in enumerate(source):
+                if 0 < r <= data.n and eligible[r-1, j]:
+                    assigned[j] = r-1
+    return assigned
+
+def search(state: State, eligible, candidates, free, deadline, rng):
+    # local search with reassign and swap moves, perturbed when stuck in a local optimum
+    best = state.assigned.copy()
+    best_costs = state.get_costs()
+    moves = 0
+    stall = 0
+
+    while time.perf_counter() < deadline and stall < STALL:
+        improved = True
+        while improved and time.perf_counter() < deadline:
+            improved = False
+
+            # reassign: best resource per job
+            for j in rng.permutation(free):
+                if time.perf_counter() >= deadline:
+                    break
+                current = state.assigned[j]
+                best_r, best_delta = current, 0.0
+                for r in candidates[j]:
+                    if r == current:
+                        continue
+                    delta = state.move(j, r)
+                    state.move(j, current)
+                    if delta < best_delta - 1e-9:
+                        best_r, best_delta = r, delta
+                if best_r != current:
+                    state.move(j, best_r)
+                    improved = True
+                    moves += 1
+
+            # swap: two jobs exchange their resources
+            for j1 in rng.permutation(free):
+                if time.perf_counter() >= deadline:
+                    break
+                for j2 in rng.choice(free, size=min(len(free), 8), replace=False):
+                    r1, r2 = state.assigned[j1], state.assigned[j2]
+                    if r1 == r2 or not eligible[r2, j1] or not eligible[r1, j2]:
+                        continue
+                    delta = state.move(j1, r2) + state.move(j2, r1)
+                    if delta < -1e-9:
+                        improved = True
+                        moves += 1
+                        break
+                    state.move(j2, r2)
+                    state.move(j1, r1)
+
+        stall += 1
+        if state.get_costs() < best_costs - 1e-9:
+            best, best_costs = state.assigned.copy(), state.get_costs()
+            stall = 0
+
+        # perturbation: a few random jobs get a random eligible resource
+        for j in rng.choice(free, size=max(1, len(free) // 10), replace=False):
+            state.move(j, rng.choice(candidates[j]))
+
+    logging.info(f"Local search finished after {moves} improving moves")
+    return best
+
+def solve(data: AssignmentData, iso, target_active, hint=None, fixed=None, budget=BUDGET):
+    result = AssignmentResult(data.k)
+    result.message = "A valid assignment of resources to all jobs was found by the heuristic solver."
+    items = [ItemResult(i+1, data.item_constraints[i], data.item_targets[i], data.target_weights[i], data.ranking_weights[i]) for i in range(data.k)]
+
+    # 1) every job needs at least one matching resource
+    eligible = data.ranking > 0
+    unmatched = checker.get_unmatched(data)
+    if unmatched:
+        logging.info(f"No matching resource for jobs {checker.get_names(data, unmatched)}")
+        result.status = AssignmentStatus.ERROR
+        result.message = f"A valid assignment is not possible. Please check whether each job has at least one matching resource. Jobs without matching resource: {checker.get_names(data, unmatched)}"
+        return result
+
+    # the ISO constraint is decided exactly, the local search may miss compliant assignments
+    if iso:
+        conflicts = checker.get_iso_conflicts(data, fixed)
+        if conflicts:
+            logging.info(f"UNSATISFIABLE: ISO constraint, conflicting jobs {checker.get_names(data, conflicts)}")
+            result.status = AssignmentStatus.UNSATISFIABLE
+            result.message = f"""A valid assignment that is ISO 17100 compliant is not possible. \n
+                                In order to solve this problem you could change or remove selection criteria from
+                                the jobs in order to find more or different matching resources. Conflicting jobs: {checker.get_names(data, conflicts)}"""
+            return result
+
+    # 2) optimal values of the individual objectives
+    with timed(result, "bounds"):
+        optimal_costs, optimal_quality, optimal_margin = get_bounds(data, iso, fixed)
+
+    targets = [None for i in range(data.k)]
+    for i, item in enumerate(items):
+        item.optimal_costs = float(optimal_costs[i])
+        item.optimal_margin = float(optimal_margin[i])
+        item.optimal_quality = float(optimal_quality[i])
+
+        if item.constrained:
+            targets[i] = item.target_margin
+            if item.optimal_margin < item.target_margin:
+                logging.info(f"UNSATISFIABLE: item {data.items[i]} target profit margin constraint.")
+                result.status = AssignmentStatus.ALTERNATIVE
+                result.message = "At least one of the items' target profit margins cannot be reached. You could consider to lower them."
+                item.satisfiable = False
+                item.distance = item.target_margin - item.optimal_margin
+                targets[i] = item.optimal_margin
+
+    # 3) greedy start and local search
+    with timed(result, "greedy"):
+        coef = get_coefficients(data, items, optimal_costs, optimal_quality)
+        assigned = get_start(data, coef, eligible, hint, fixed)
+        state = State(data, iso, coef, targets, data.target if target_active else None, assigned)
+    logging.info(f"Greedy assignment with objective {round(state.get_objective(), 4)}")
+
+    with timed(result, "local search"):
+        candidates = [np.flatnonzero(eligible[:, j]) for j in range(data.m)]
+        free = np.array([j for j in range(data.m) if not (fixed and fixed[j]) and len(candidates[j]) > 1], dtype=int)
+        if len(free):
+            state = State(data, iso, coef, targets, data.target if target_active else None,
+                          search(state, eligible, candidates, free, time.perf_counter() + budget, np.random.default_rng(SEED)))
+    logging.info(f"Heuristic assignment with objective {round(state.get_objective(), 4)}")
+
+    # 4) remaining hard constraint violations decide the status
+    if state.conflicts:
+        # a compliant assignment may exist (see the check above), the search did not find one
+        logging.info(f"No ISO compliant assignment found by the heuristic ({state.conflicts} conflicts left)")
+        result.status = AssignmentStatus.ERROR
+        result.message = "No ISO 17100 compliant assignment could be found within the time limit."
+        return result
+
+    for i, item in enumerate(items):
+        if targets[i] is not None and state.get_shortfall(i) > 1e-9:
+            result.status = AssignmentStatus.ALTERNATIVE
+            result.message = "At least one of the items' target profit margins cannot be reached. You could consider to lower them."
+    if target_active and state.get_project_shortfall() > 1e-9:
+        logging.info("UNSATISFIABLE: project target profit margin constraint")
+        result.status = AssignmentStatus.ALTERNATIVE
+        result.message = "The project's target profit margin cannot be reached. You could consider to lower it."
+
+    # update the item information
+    idx = state.items
+    count = np.bincount(idx, minlength=data.k)
+    quality = np.bincount(idx, weights=data.ranking[state.assigned, np.arange(data.m)], minlength=data.k) / count
+    for i, item in enumerate(items):
+        item.actual_margin = float(state.get_margin(i))
+        item.actual_quality = float(quality[i])
+
+    result.assignment = [int(r)+1 for r in state.assigned] # minizinc index starts with 1
+    result.items = items
+
+    result.project_margin = float(state.get_project_margin())
+    result.objective = state.get_objective()
+    result.capacity_violations = state.capacity
+    result.parallel_violations = state.parallel
+
+    return result
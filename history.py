@@ -0,0 +1,52 @@
+import os
+import json
+import pickle
+import logging
+
+import config as cfg
+
+HISTORY = getattr(cfg, "history", "history") # directory with the last stored assignment of every order
+
+def get_path(order, suffix="json"):
+    return os.path.join(HISTORY, f"{order}.{suffix}")
+
+def save_assignment(order, data, result, gap):
+    os.makedirs(HISTORY, exist_ok=True)
+
+    # last solved problem instance, the base for incremental re-optimization
+    with open(get_path(order, "pickle"), 'wb') as f:
+        pickle.dump({"data": data, "result": result, "gap": gap}, f)
+
+    # store resource ids per job id, indices may change between runs
+    assignment = {str(job): data.resources[result.assignment[i]-1] for i, job in enumerate(data.jobs)} # minizinc index 1..n vs. 0..n-1
+
+    with open(get_path(order), 'w', encoding='utf-8') as f:
+        json.dump({"order": order, "assignment": assignment}, f)
+
+def load_hint(order, data):
+    path = get_path(order)
+    if not os.path.exists(path):
+        return None
+
+    with open(path, encoding='utf-8') as f:
+        assignment = json.load(f)["assignment"]
+
+    # resource (1..n) per job, 0 if the job or resource is not part of the order anymore
+    index = {resource: r+1 for r, resource in enumerate(data.resources)}
+    hint = [index.get(assignment.get(str(job)), 0) for job in data.jobs]
+
+    logging.info(f"Last stored assignment of order {order} found for {sum(1 for r in hint if r)} of {data.m} jobs")
+    return hint
+
+def load_snapshot(order):
+    path = get_path(order, "pickle")
+    if not os.path.exists(path):
+        return None
+
+    try:
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+    except (pickle.UnpicklingError, AttributeError, TypeError, EOFError) as err:
+        # e.g. written by an older version
+        logging.warning(f"Snapshot of order {order} cannot be loaded: {err}")
+        return None
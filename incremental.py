@@ -0,0 +1,92 @@
+import logging
+
+import minimizer
+from collector import AssignmentData
+
+GAP_TOLERANCE = 0.05 # allowed growth of the objective gap before falling back to a full solve
+
+def get_job_signature(data: AssignmentData, j):
+    # everything about a job that influences its assignment, by ids instead of indices
+    return (data.jobtype[j],
+            data.items[data.item[j]-1],
+            sorted(data.jobs[succ-1] for succ in data.workflow[j]["set"] if succ > 0),
+            {data.resources[r]: (data.ranking[r][j], data.price[r][j]) for r in range(data.n) if data.ranking[r][j] > 0},
+            list(data.planned[j]))
+
+def get_item_signature(data: AssignmentData, i):
+    return (data.profit[i], data.item_constraints[i], data.item_targets[i], data.target_weights[i], data.ranking_weights[i])
+
+def get_affected_jobs(old: AssignmentData, old_result, new: AssignmentData):
+    old_jobs = {job: j for j, job in enumerate(old.jobs)}
+    old_items = {item: i for i, item in enumerate(old.items)}
+    old_resources = {resource: r for r, resource in enumerate(old.resources)}
+
+    changed_items = {i+1 for i, item in enumerate(new.items)
+                     if item not in old_items or get_item_signature(old, old_items[item]) != get_item_signature(new, i)}
+
+    changed_resources = {resource for r, resource in enumerate(new.resources)
+                         if resource not in old_resources or list(old.schedule[old_resources[resource]]) != list(new.schedule[r])}
+
+    old_assignment = {job: old.resources[old_result.assignment[j]-1] for j, job in enumerate(old.jobs)}
+
+    changed = set()
+    for j, job in enumerate(new.jobs):
+        if (job not in old_jobs 
+                or new.item[j] in changed_items
+                or old_assignment[job] in changed_resources
+                or get_job_signature(old, old_jobs[job]) != get_job_signature(new, j)):
+            changed.add(j)
+
+    # the objective of an item couples all its jobs
+    items = {new.item[j] for j in changed}
+    return {j for j in range(new.m) if new.item[j] in items}
+
+def get_fixed(old: AssignmentData, old_result, new: AssignmentData, affected):
+    old_assignment = {job: old.resources[old_result.assignment[j]-1] for j, job in enumerate(old.jobs)}
+    index = {resource: r+1 for r, resource in enumerate(new.resources)}
+
+    fixed = [0 for j in range(new.m)]
+    for j, job in enumerate(new.jobs):
+        if j not in affected:
+            r = index.get(old_assignment[job], 0)
+            # the previous resource must still be eligible
+            if r and new.ranking[r-1][j] > 0:
+                fixed[j] = r
+    return fixed
+
+def is_acceptable(data: AssignmentData, target_active, result, gap):
+    if result.status not in (minimizer.AssignmentStatus.OPTIMAL, minimizer.AssignmentStatus.FEASIBLE):
+        return False
+
+    # fixed jobs must not prevent the margin constraints from being met
+    for item in result.items:
+        if item.constrained and item.actual_margin < min(item.target_margin, item.optimal_margin):
+            return False
+    if target_active and result.project_margin < data.target:
+        return False
+
+    return minimizer.get_gap(result) <= gap + GAP_TOLERANCE
+
+def solve(data: AssignmentData, iso, target_active, snapshot, workers=minimizer.WORKERS, hint=None):
+    # snapshot: last solved problem instance of the order (see history.load_snapshot)
+    if snapshot is None or snapshot["data"].l != data.l or snapshot["data"].target != data.target:
+        logging.info("No comparable snapshot, full solve")
+        return minimizer.solve(data, iso, target_active, None, workers, hint)
+
+    affected = get_affected_jobs(snapshot["data"], snapshot["result"], data)
+    if not affected or len(affected) == data.m:
+        # unchanged orders are usually answered from the result cache
+        logging.info(f"{len(affected)} of {data.m} jobs affected by changes, full solve")
+        return minimizer.solve(data, iso, target_active, None, workers, hint)
+
+    fixed = get_fixed(snapshot["data"], snapshot["result"], data, affected)
+    logging.info(f"Incremental solve: {len(affected)} of {data.m} jobs affected, {sum(1 for r in fixed if r)} jobs fixed")
+
+    result = minimizer.optimize(data, iso, target_active, workers, hint, fixed)
+    result.incremental = True
+
+    if not is_acceptable(data, target_active, result, snapshot["gap"]):
+        logging.info(f"Incremental solution not acceptable (gap {round(minimizer.get_gap(result), 4)} vs. {round(snapshot['gap'], 4)}), full solve")
+        return minimizer.solve(data, iso, target_active, None, workers, hint)
+
+    return result
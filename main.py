@@ -3,138 +3,174 @@ import logging
 
 import collector
 import dbconnector
-import minimizer 
+import decomposer
+import minimizer
 import bmconnector
+import history
+import incremental
+import profiler
+import snapshot
+import tracer
+import writer
+
+# the statistics of a run are appended to the item note below this line
+SEPARATOR = "\n---------------\n"
+
+def get_bar(delta):
+    bar = ""
+    if delta >= 100.0:
+        bar += "##########"
+    else:
+        for i in range(0,100,10):
+            if i in range(delta):
+                bar += "#"
+            else:
+                bar += "="
+    return bar
 
-if __name__ == "__main__":
+def get_item_statistics(note, item_result):
+    item_statistics = note + SEPARATOR
 
-    ORDER = 173
-    HOSTNAME = "qa30.plunet.com"
+    if item_result.satisfiable:
+        item_statistics += f"target profit margin of {round(item_result.target_margin*100,2)}% was reached or exceeded: {round(item_result.actual_margin*100,2)}% \n"
+    else:
+        item_statistics += f"original target profit margin of {round(item_result.target_margin*100,2)}% was lowered by {round(item_result.distance*100,2)}% to {round(item_result.actual_margin*100,2)}% \n"
 
-    logging.basicConfig(filename='logger.log', format='%(asctime)s %(levelname)s: %(message)s', datefmt='%d/%m/%y %H:%M:%S', level=logging.INFO)
+    delta = round((item_result.actual_margin/item_result.optimal_margin)*100)
+    item_statistics += f"profit margin {round(item_result.actual_margin*100,2)}% "
+    item_statistics += get_bar(delta)
+    item_statistics += f" {round(item_result.optimal_margin*100,2)}%\n"
 
-    # parse arguments [scriptname, order, host]
-    if len(sys.argv) > 1:
-        ORDER = sys.argv[1]
-        HOSTNAME = sys.argv[2]
+    delta = round((item_result.optimal_quality/item_result.actual_quality)*100)
+    item_statistics += f"quality {round(item_result.actual_quality,2)} "
+    item_statistics += get_bar(delta)
+    item_statistics += f" {round(item_result.optimal_quality,2)}\n"
 
-    # get data from database
-    logging.info("Start collecting data from database")
-    data = collector.get_data(ORDER)
-    logging.info("Finished collecting data from database")
+    return item_statistics
 
-    iso_active = dbconnector.is_iso_active(ORDER)
-    target_active = dbconnector.is_target_profit_margin_active()
+def update_note(item_id, item_result):
+    note = bmconnector.get_note(item_id)
+    if note is None:
+        return False
 
-    # call minizinc
-    logging.info("Start optimization process")
-    result = minimizer.solve(data, iso_active, target_active, 10)
+    # statistics of an earlier run or of an attempt whose reply got lost are replaced, not appended again
+    note = note.split(SEPARATOR)[0]
+    item_statistics = get_item_statistics(note, item_result)
+    logging.info(item_statistics)
+
+    return bmconnector.set_note(item_id, item_statistics)
 
-    # connect to bm
-    bmconnector.login(HOSTNAME)
+def update_resource(job, resource_id):
+    round_id = dbconnector.get_current_round(job)
+    # send results to bm
+    return bmconnector.set_resource(resource_id, round_id)
 
+def get_statistics(data, result, target_active):
     statistics = ""
 
     if result.status == minimizer.AssignmentStatus.ERROR or result.status == minimizer.AssignmentStatus.UNSATISFIABLE:
         statistics = result.message
-        bmconnector.set_description(ORDER, statistics)
 
     if result.status == minimizer.AssignmentStatus.ALTERNATIVE:
         statistics += f"No valid solution for the given constraints could be found. A valid alternative is suggested.\n"
 
-        if target_active and result.project_margin < data.target: 
+        if target_active and result.project_margin < data.target:
             statistics += f"target profit margin of {round(data.target*100,2)}% could not be reached \n"
         else:
-            statistics += f"project profit margin: {round(result.project_margin*100,2)}%"            
+            statistics += f"project profit margin: {round(result.project_margin*100,2)}%"
         statistics += f"{result.parallel_violations} parallel assignments \n{result.capacity_violations} capacities exceeded"
-
-        bmconnector.set_description(ORDER, statistics) 
         print(statistics)
 
-        for i, item_id in enumerate(data.items):
-            item_result = result.items[i]
-            note = bmconnector.get_note(item_id)
-
-            item_statistics = note + "\n---------------\n"
-
-            if item_result.satisfiable:
-                item_statistics += f"target profit margin of {round(item_result.target_margin*100,2)}% was reached or exceeded: {round(item_result.actual_margin*100,2)}% \n"
-            else:
-                item_statistics += f"original target profit margin of {round(item_result.target_margin*100,2)}% was lowered by {round(item_result.distance*100,2)}% to {round(item_result.actual_margin*100,2)}% \n"
-                
-            delta = round((item_result.actual_margin/item_result.optimal_margin)*100)
-            item_statistics += f"profit margin {round(item_result.actual_margin*100,2)}% "
-            if delta >= 100.0:
-                item_statistics += "##########"
-            else:
-                for i in range(0,100,10):
-                    if i in range(delta):
-                        item_statistics += "#"
-                    else:
-                        item_statistics += "="
-            item_statistics += f" {round(item_result.optimal_margin*100,2)}%\n"
-
-            delta = round((item_result.optimal_quality/item_result.actual_quality)*100)
-            item_statistics += f"quality {round(item_result.actual_quality,2)} "
-            if delta >= 100.0:
-                item_statistics += "##########"
-            else:
-                for i in range(0,100,10):
-                    if i in range(delta):
-                        item_statistics += "#"
-                    else:
-                        item_statistics += "="
-            item_statistics += f" {round(item_result.optimal_quality,2)}\n"
-            
-            bmconnector.set_note(item_id, item_statistics)
-            print(item_statistics)
-    
-    if result.status == minimizer.AssignmentStatus.OPTIMAL:
+    if result.status in (minimizer.AssignmentStatus.OPTIMAL, minimizer.AssignmentStatus.FEASIBLE):
         statistics += f"""{result.message}
                 project profit margin: {round(result.project_margin*100,2)}%
                 {result.parallel_violations} parallel assignments
                 {result.capacity_violations} capacities exceeded"""
-
-        bmconnector.set_description(ORDER, statistics) 
         print(statistics)
 
-        for i, item_id in enumerate(data.items):
-            item_result = result.items[i]
-            note = bmconnector.get_note(item_id)
+    return statistics
 
-            item_statistics = note + "\n---------------\n"
+def write_back(order, data, result, statistics):
+    tasks = [(f"description of order {order}", lambda: bmconnector.set_description(order, statistics))]
 
-            item_statistics += f"target profit margin of {round(item_result.target_margin*100,2)}% was reached or exceeded: {round(item_result.actual_margin*100,2)}% \n"
-            delta = round((item_result.actual_margin/item_result.optimal_margin)*100)
-            item_statistics += f"profit margin {round(item_result.actual_margin*100,2)}% "
-            if delta >= 100.0:
-                item_statistics += "##########"
-            else:
-                for i in range(0,100,10):
-                    if i in range(delta):
-                        item_statistics += "#"
-                    else:
-                        item_statistics += "="
-            item_statistics += f" {round(item_result.optimal_margin*100,2)}%\n"
-
-            delta = round((item_result.optimal_quality/item_result.actual_quality)*100)
-            item_statistics += f"quality {round(item_result.actual_quality,2)} "
-            if delta >= 100.0:
-                item_statistics += "##########"
-            else:
-                for i in range(0,100,10):
-                    if i in range(delta):
-                        item_statistics += "#"
-                    else:
-                        item_statistics += "="
-            item_statistics += f" {round(item_result.optimal_quality,2)}\n"
-            
-            bmconnector.set_note(item_id, item_statistics)
-            print(item_statistics)
-        
+    if result.status in (minimizer.AssignmentStatus.ALTERNATIVE, minimizer.AssignmentStatus.OPTIMAL, minimizer.AssignmentStatus.FEASIBLE):
+        for i, item_id in enumerate(data.items):
+            tasks.append((f"note of item {item_id}", lambda item_id=item_id, item_result=result.items[i]: update_note(item_id, item_result)))
+
+    if result.status in (minimizer.AssignmentStatus.OPTIMAL, minimizer.AssignmentStatus.FEASIBLE):
         for i, job in enumerate(data.jobs):
-            round_id = dbconnector.get_current_round(job)
             resource_id = data.resources[result.assignment[i]-1] # minizinc index 1..n vs. 0..n-1
-            # send results to bm
-            bmconnector.set_resource(resource_id, round_id)
-        
+            tasks.append((f"resource of job {job}", lambda job=job, resource_id=resource_id: update_resource(job, resource_id)))
+
+    return writer.run(tasks)
+
+def optimize(order, incremental_mode=False, snapshot_path=None):
+    # get data from database
+    logging.info("Start collecting data from database")
+    with tracer.span("collect"):
+        data = collector.get_data(order)
+        iso_active = dbconnector.is_iso_active(order)
+        target_active = dbconnector.is_target_profit_margin_active()
+    logging.info("Finished collecting data from database")
+
+    # write a snapshot for offline replays (optional)
+    if snapshot_path:
+        snapshot.save(snapshot_path, data, iso_active, target_active)
+
+    # call minizinc, warm started with the last stored assignment of this order
+    logging.info("Start optimization process")
+    with tracer.span("solve", incremental=incremental_mode) as span:
+        hint = history.load_hint(order, data)
+        previous = history.load_snapshot(order)
+        if incremental_mode:
+            # only re-solve the jobs affected by changes since the last run
+            result = incremental.solve(data, iso_active, target_active, previous, hint=hint)
+        else:
+            # independent parts of the order are solved separately
+            result = decomposer.solve(data, iso_active, target_active, minimizer.BUDGET, hint=hint)
+        span.set(status=result.status.name, n=data.n, m=data.m, k=data.k, l=data.l)
+
+    if result.status in (minimizer.AssignmentStatus.ALTERNATIVE, minimizer.AssignmentStatus.OPTIMAL, minimizer.AssignmentStatus.FEASIBLE):
+        # the gap of the last full solve stays the reference for incremental runs
+        gap = previous["gap"] if result.incremental else minimizer.get_gap(result)
+        with tracer.span("history"):
+            history.save_assignment(order, data, result, gap)
+
+    return data, result, target_active
+
+def publish(order, data, result, target_active):
+    statistics = get_statistics(data, result, target_active)
+
+    # send statistics, notes and resource assignments to bm
+    with tracer.span("write-back"):
+        return write_back(order, data, result, statistics)
+
+if __name__ == "__main__":
+
+    ORDER = 173
+    HOSTNAME = "qa30.plunet.com"
+
+    logging.basicConfig(filename='logger.log', format='%(asctime)s %(levelname)s: %(message)s', datefmt='%d/%m/%y %H:%M:%S', level=logging.INFO)
+
+    # parse arguments [scriptname, order, host, (--incremental), (--snapshot), (--profile)]
+    if len(sys.argv) > 1:
+        ORDER = sys.argv[1]
+        HOSTNAME = sys.argv[2]
+    INCREMENTAL = "--incremental" in sys.argv[3:]
+    SNAPSHOT = f"{ORDER}.npz" if "--snapshot" in sys.argv[3:] else None # for offline replays, see replay.py
+    if "--profile" in sys.argv[3:]:
+        profiler.enable()
+
+    with tracer.trace(f"order {ORDER}", order=ORDER):
+        data, result, target_active = optimize(ORDER, INCREMENTAL, SNAPSHOT)
+
+        # connect to bm
+        bmconnector.login(HOSTNAME)
+
+        results = publish(ORDER, data, result, target_active)
+    print(writer.summarize(results))
+
+    if profiler.enabled:
+        summary = profiler.get_summary()
+        print(profiler.report(summary))
+        profiler.save(f"order {ORDER}", summary)
@@ -1,141 +1,331 @@
+import os
+import json
+import time
 import logging
-import enum
-
-from dataclasses import dataclass, field
-from typing import List
-from minizinc import Instance, Model, Solver, Status, error
-
+import tempfile
+import functools
+
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import timedelta
+from minizinc import Model, Solver, Status, error
+
+import config as cfg
+import cache
+import calculator
+import checker
+import compressor
+import flat
+import heuristic
+import pruner
+import tracer
 from collector import AssignmentData
-
-ISO_CONSTRAINT = """
-                constraint forall(j1 in JOB) (
-                    forall(j2 in workflow[j1]) (
-                        (jobtype[j1] = TRA /\ jobtype[j2] = REV) -> assigned[j1] != assigned[j2]
-                    )
-                ); 
-                """
-PROJECT_MARGIN_CONSTRAINT = "constraint profit_margin >= target;"
-
-class AssignmentStatus(enum.Enum):
-    UNSATISFIABLE = 1
-    OPTIMAL = 2
-    ALTERNATIVE = 3
-    ERROR = 4
-
-@dataclass
-class AssignmentResult:
-    k: int # number of items
-
-    status: AssignmentStatus = AssignmentStatus.OPTIMAL
-    message: str = "A valid assignment of resources to all job that optimizes the given objectives was found." 
-
-    assignment: List = field(default_factory=list)
-
-    items: List = field(default_factory=list)
-    
-    project_margin: float = 0.0
-    capacity_violations: int = 0
-    parallel_violations: int = 0
-
-    def __post_init__(self):
-        self.optimal_costs = [0 for i in range(self.k)]
-        self.optimal_quality = [0 for i in range(self.k)]
-
-@dataclass
-class ItemResult:
-    midx: int   
-    constrained: bool
-    target_margin: float
-    
-    margin_weight: int
-    quality_weight: int
-
-    constraint: str = ""
-    optimal_costs: float = 0.0
-    optimal_margin: float = 0.0
-    actual_margin: float = 0.0
-    optimal_quality: float = 0.0
-    actual_quality: float = 0.0
-
-    satisfiable: bool = True
-    distance: float = 0.0
-
-    def __post_init__(self):
-        if self.constrained:
-            self.constraint = f"constraint margin[{self.midx}] >= item_targets[{self.midx}];"
-
-    def update_constraint(self, target):
-        self.constraint = f"constraint margin[{self.midx}] >= {target};"
-
-def add_data(instance, data: AssignmentData):
-    instance["n"] = data.n
-    instance["m"] = data.m
-    instance["k"] = data.k
-    instance["l"] = data.l
-    instance["profit"] = data.profit
-    instance["item_targets"] = data.item_targets
-    instance["target"] = data.target
-    instance["target_weights"] = data.target_weights
-    instance["ranking_weights"] = data.ranking_weights
-    instance["jobtype"] = data.jobtype
-    instance["workflow"] = data.workflow
-    instance["item"] = data.item
-    instance["ranking"] = data.ranking
-    instance["price"] = data.price
-    instance["schedule"] = data.schedule
-    instance["planned"] = data.planned
-
-def opt(instance: Instance, objective):
-    with instance.branch() as child:
-
-        child.add_string(objective)
-
-        try:
-            result = child.solve()
-        except error as err:
-            logging.error(f"An error occurred while trying to find optimal value for '{objective}': {err.message}")
+from results import AssignmentStatus, AssignmentResult, ItemResult, timed
+
+MODEL = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assign.mzn")
+
+WORKERS = os.cpu_count() or 1 # number of parallel solver processes for the item probes
+
+# "minizinc", "heuristic" or "auto" (the heuristic for orders with more than HEURISTIC_SIZE resource/job pairs)
+ENGINE = getattr(cfg, "engine", "auto")
+HEURISTIC_SIZE = getattr(cfg, "heuristic_size", 50000)
+
+BUDGET = getattr(cfg, "time_budget", 600) # wall-clock budget of a run in seconds, None = no limit
+MIN_LIMIT = 1 # min. time limit of a single solve in seconds, also after the budget ran out
+
+# the item optima are calculated directly, the solver probes only verify them (and take over groups of linked jobs too large to search)
+VERIFY = getattr(cfg, "verify_probes", False)
+
+# share of the remaining budget of the flattening, the solver ISO check and the item probes, the stages split the rest evenly
+SHARES = {"flatten": 0.05, "iso check": 0.05, "probes": 0.4}
+
+def get_json(data: AssignmentData):
+    # minizinc json data format, arrays are converted in one go
+    return {
+        "n": data.n,
+        "m": data.m,
+        "k": data.k,
+        "l": data.l,
+        "profit": data.profit.tolist(),
+        "item_targets": data.item_targets.tolist(),
+        "target": float(data.target),
+        "target_weights": data.target_weights.tolist(),
+        "ranking_weights": data.ranking_weights.tolist(),
+        "jobtype": [{"e": jobtype} for jobtype in data.jobtype],
+        "workflow": data.workflow,
+        "item": [int(i) for i in data.item],
+        "ranking": data.ranking.tolist(),
+        "price": data.price.tolist(),
+        "schedule": data.schedule.tolist(),
+        "planned": data.planned.tolist(),
+        "day_weights": data.day_weights.tolist(),
+        "p": len(data.parallel),
+        "par1": [pair[0] for pair in data.parallel],
+        "par2": [pair[1] for pair in data.parallel],
+    }
+
+def write_data(data: AssignmentData, path):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(get_json(data), f)
+
+@contextmanager
+def data_file(data: AssignmentData):
+    # one data file is shared by all instances of a run
+    fd, path = tempfile.mkstemp(prefix="assign_", suffix=".json")
+    os.close(fd)
+    try:
+        write_data(data, path)
+        yield path
+    finally:
+        os.remove(path)
+
+class Budget:
+    # wall-clock budget of a run, every solve gets a share of the remaining time
+
+    def __init__(self, seconds):
+        self.deadline = time.perf_counter() + seconds if seconds else None
+
+    def get_remaining(self):
+        if self.deadline is None:
             return None
+        return max(MIN_LIMIT, self.deadline - time.perf_counter())
 
-        if result.status != Status.OPTIMAL_SOLUTION:
-            logging.error(f"No solution found for '{objective}': {result.status}")
+    def get_limit(self, share=1.0):
+        if self.deadline is None:
             return None
+        return timedelta(seconds=max(MIN_LIMIT, self.get_remaining() * share))
+
+def is_proven(res):
+    # False if the solver was stopped by its time limit, the solution (if any) may not be optimal
+    return res.status in (Status.OPTIMAL_SOLUTION, Status.UNSATISFIABLE)
+
+def get_hint(data: AssignmentData, hint):
+    # hint: resource (1..n) per job that the solver should start from, 0 = no hint
+    if not hint:
+        return {}
+    # only eligible resources are valid hints
+    return {j: r for j, r in enumerate(hint) if 0 < r <= data.n and data.ranking[r-1][j] > 0}
+
+def get_fixed(model: flat.FlatModel, fixed):
+    # fixed: resource (1..n) per job that must be kept, 0 = free
+    return [model.fix("assigned", j, r) for j, r in enumerate(fixed or []) if r]
+
+def run(model: flat.FlatModel, data: AssignmentData, constraints, hint=None, limit=None, label="search"):
+    hints = get_hint(data, hint)
+
+    start = time.perf_counter()
+    with tracer.span("solve", label=label) as span:
+        res = model.solve(constraints, hints, limit, label)
+        span.record(res.statistics)
+    duration = time.perf_counter() - start
+
+    if not is_proven(res):
+        logging.info(f"{label}: time limit of {limit} reached, status {res.status}")
+    logging.info(f"{label}: {res.status} after {res.statistics.get('time')} (wall time {round(duration, 2)}s)")
+    if hints:
+        kept = sum(1 for j, r in hints.items() if res.solution.assigned[j] == r) if res.solution else 0
+        logging.info(f"Warm start hint used for {len(hints)} of {data.m} jobs, {kept} jobs kept their hinted resource")
+    else:
+        logging.info("No warm start hint used")
+
+    return res
+
+def get_item_signature(data: AssignmentData, i, iso, fixed=None):
+    # everything the optimal values of item i depend on, including the kept resources of an incremental run
+    midx = i+1
+    jobs = {j for j in range(data.m) if data.item[j] == midx}
 
-        return result
+    if iso:
+        # the ISO constraint links jobs of a workflow, possibly across items
+        neighbours = [set() for j in range(data.m)]
+        for j in range(data.m):
+            for succ in data.workflow[j]["set"]:
+                if succ > 0:
+                    neighbours[j].add(succ-1)
+                    neighbours[succ-1].add(j)
+        stack = list(jobs)
+        while stack:
+            for j in neighbours[stack.pop()] - jobs:
+                jobs.add(j)
+                stack.append(j)
+
+    jobs = sorted(jobs)
+    position = {j: p for p, j in enumerate(jobs)}
+
+    return {
+        "profit": float(data.profit[i]),
+        "iso": iso,
+        "jobs": [[data.jobtype[j], data.item[j] == midx,
+                  sorted(position[succ-1] for succ in data.workflow[j]["set"] if succ-1 in position),
+                  data.ranking[:, j].tolist(), data.price[:, j].tolist(), int(fixed[j]) if fixed else 0] for j in jobs],
+    }
+
+def probe(model: flat.FlatModel, constraints, objective, i, limit=None):
+    # probes share the flatzinc of the order, they only differ in their objective
+    res = opt(model, constraints, f"{objective}[{i+1}]", model.objective([(1.0, (objective, i))]), limit)
+    if not res:
+        return None, False
+    # (optimal objective value, margin of the item in that solution), proven optimal
+    return (res.objective, res["margin"][i]), is_proven(res)
+
+def opt(model: flat.FlatModel, constraints, name, objective, limit=None):
+    try:
+        with tracer.span("solve", objective=name) as span:
+            result = model.solve(constraints + [objective], None, limit, name)
+            span.record(result.statistics)
+    except error.MiniZincError as err:
+        logging.error(f"An error occurred while trying to find optimal value for '{name}': {err.message}")
+        return None
+
+    if result.status == Status.SATISFIED:
+        # best value found within the time limit, still a usable normalization
+        logging.warning(f"Time limit reached for '{name}', the value is not proven optimal")
+    elif result.status != Status.OPTIMAL_SOLUTION:
+        logging.error(f"No solution found for '{name}': {result.status}")
+        return None
+
+    return result
      
-def solve(data: AssignmentData, iso, target_active, steps):
-
-    model = Model("assign.mzn")
-    cbc = Solver.lookup("cbc") # MIP solver   
-    instance = Instance(cbc, model)
+@functools.lru_cache(maxsize=None)
+def get_solver(name):
+    # the solver lookup starts a minizinc process, long-running workers do it once
+    return Solver.lookup(name)
+
+@functools.lru_cache(maxsize=None)
+def get_model(path):
+    return Model(path)
+
+def get_engine(data: AssignmentData, engine):
+    if engine == "auto":
+        # cbc becomes impractical for the largest orders
+        return "heuristic" if data.n * data.m > HEURISTIC_SIZE else "minizinc"
+    return engine
+
+def solve(data: AssignmentData, iso, target_active, budget=None, workers=WORKERS, hint=None, use_cache=True, engine=ENGINE):
+    # budget: wall-clock budget in seconds, None = BUDGET
+    # planners often re-run unchanged orders, identical problem instances are answered from the cache
+    start = time.perf_counter()
+    engine = get_engine(data, engine)
+    key = cache.get_key(data, iso, target_active, cache.get_file_hash(MODEL), engine) if use_cache else None
+
+    with tracer.span("cache"):
+        result = cache.load("results", key) if use_cache else None
+    if result is not None:
+        logging.info("Result found in cache")
+        result.timings = {"cache": time.perf_counter() - start}
+        return result
 
-    add_data(instance, data)
+    result = optimize(data, iso, target_active, workers, hint, engine=engine, budget=budget, use_cache=use_cache)
+
+    # errors are not cached, they may be caused by the solver environment,
+    # neither are results of solves that were stopped by their time limit
+    if use_cache and result.status != AssignmentStatus.ERROR and result.proven:
+        cache.store("results", key, result)
+
+    return result
+
+def set_feasible(result: AssignmentResult):
+    # valid assignments that are not proven optimal are reported (and kept out of the cache) as FEASIBLE
+    result.proven = False
+    if result.status == AssignmentStatus.OPTIMAL:
+        result.status = AssignmentStatus.FEASIBLE
+        result.message = f"A valid assignment was found within the time limit. It is not proven to be optimal (gap {round(result.optimality_gap*100, 2)}%)."
+
+def get_gap(result: AssignmentResult):
+    # every normalized item objective is at least 1 and the soft constraint costs at least 0
+    bound = sum(item.margin_weight + item.quality_weight for item in result.items)
+    return (result.objective - bound) / result.objective if result.objective > 0 else 0.0
+
+def optimize(data: AssignmentData, iso, target_active, workers=WORKERS, hint=None, fixed=None, engine=ENGINE, budget=None, use_cache=True):
+    engine = get_engine(data, engine)
+    budget = Budget(BUDGET if budget is None else budget)
+
+    # the model runs on buckets of days with identical profiles instead of single days
+    start = time.perf_counter()
+    with tracer.span("compression"):
+        data = compressor.compress(data)
+    compression = time.perf_counter() - start
+
+    # dominated resources are removed, hinted and fixed resources are kept
+    start = time.perf_counter()
+    with tracer.span("pruning") as span:
+        data, kept = pruner.prune(data, hint, fixed)
+        hint, fixed = pruner.get_index(kept, hint), pruner.get_index(kept, fixed)
+        span.set(n=data.n)
+    pruning = time.perf_counter() - start
+
+    if engine == "heuristic":
+        logging.info(f"Heuristic search for {data.n} resources and {data.m} jobs")
+        remaining = budget.get_remaining()
+        result = heuristic.solve(data, iso, target_active, hint, fixed, heuristic.BUDGET if remaining is None else min(heuristic.BUDGET, remaining))
+        # the local search proves nothing, its assignments are never reported as optimal
+        if result.items:
+            result.optimality_gap = get_gap(result)
+        set_feasible(result)
+    else:
+        with data_file(data) as path:
+            result = search(data, path, iso, target_active, workers, hint, fixed, budget, use_cache)
+
+    result.assignment = pruner.restore(kept, result.assignment)
+    result.timings = {"compression": compression, "pruning": pruning, **result.timings}
+    return result
+
+def search(data: AssignmentData, path, iso, target_active, workers=WORKERS, hint=None, fixed=None, budget=None, use_cache=True):
+    budget = budget or Budget(None)
 
     result = AssignmentResult(data.k)
     items = [ItemResult(i+1, data.item_constraints[i], data.item_targets[i], data.target_weights[i], data.ranking_weights[i]) for i in range(data.k)]
 
-    # 1) check if the problem instance has any data inconsistencies
-    with instance.branch() as child:
-        child.add_string("obj = 0.0;")
+    # 1) check if the problem instance has any data inconsistencies, before any solver process starts
+    with timed(result, "data check"):
+        unmatched = checker.get_unmatched(data)
+    if unmatched:
+        logging.info(f"No matching resource for jobs {checker.get_names(data, unmatched)}")
+        result.status = AssignmentStatus.ERROR
+        result.message = f"A valid assignment is not possible. Please check whether each job has at least one matching resource. Jobs without matching resource: {checker.get_names(data, unmatched)}"
+        return result
+
+    # 2) check optional ISO constraint 
+    conflicts = []
+    if iso:
+        logging.info("ISO constraint switched on")
+        with timed(result, "iso check"):
+            conflicts = checker.get_iso_conflicts(data, fixed)
+        if conflicts:
+            # the ISO constraint prevents a valid solution to be found
+            logging.info(f"UNSATISFIABLE: ISO constraint, conflicting jobs {checker.get_names(data, conflicts)}")
+            result.status = AssignmentStatus.UNSATISFIABLE
+            result.message = f"""A valid assignment that is ISO 17100 compliant is not possible. \n 
+                                In order to solve this problem you could change or remove selection criteria from 
+                                the jobs in order to find more or different matching resources. Conflicting jobs: {checker.get_names(data, conflicts)}"""
+            return result
+
+    # flatten the model once per order, all following solves reuse the flatzinc
+    with timed(result, "flatten"):
         try:
-            child.solve()
+            with tracer.span("flatten") as span:
+                model = flat.flatten(get_model(MODEL), get_solver(flat.SOLVER), path, budget.get_limit(SHARES["flatten"]))
+                span.record(model.statistics)
         except error.MiniZincAssertionError as err:
-            # there must be an error in the problem instance, e.g. not every job has at least one matching resource
+            # the assertions of the model are checked above, this should not happen
             logging.info(err) 
             result.status = AssignmentStatus.ERROR
             result.message = "A valid assignment is not possible. Please check whether each job has at least one matching resource."
             return result
 
-    # 2) check optional ISO constraint 
-    if iso:
-        # add ISO 17100 constraint to model instance
-        logging.info("ISO constraint added")
-        instance.add_string(ISO_CONSTRAINT)
-
-        with instance.branch() as child:
-            child.add_string("obj = 0.0;")
-            res = child.solve()
+    # constraints that hold for every following solve
+    constraints = get_fixed(model, fixed) + [model.fix("iso_switch", None, int(bool(iso)))]
+
+    if conflicts is None:
+        # the ISO check was too large to be decided in python, the solver decides
+        with timed(result, "iso check (solver)"):
+            with tracer.span("solve") as span:
+                res = model.solve(constraints + [model.objective([])], None, budget.get_limit(SHARES["iso check"]), "iso check")
+                span.record(res.statistics)
+            if res.status == Status.UNKNOWN:
+                # not decided within the time limit, the stages will tell
+                logging.info("ISO check stopped by its time limit")
             if res.status == Status.UNSATISFIABLE:
-                # the ISO constraint prevents a valid solution to be found
                 logging.info("UNSATISFIABLE: ISO constraint")
                 result.status = AssignmentStatus.UNSATISFIABLE
                 result.message = """A valid assignment that is ISO 17100 compliant is not possible. \n 
@@ -144,12 +334,54 @@ def solve(data: AssignmentData, iso, target_active, steps):
                 return result
 
     # 3) check for each item
-    objective = "constraint obj = "
+    # optimal values of the individual objectives, they only depend on the eligible resources (and the ISO pairs)
+    # and are calculated directly, the remaining ones are searched by independent solver probes in parallel
+    # items whose data did not change since an earlier run are taken from the cache
+    with timed(result, "probes"):
+        with tracer.span("calculate"):
+            calculated = calculator.calculate(data, iso, fixed)
+
+        model_hash = cache.get_file_hash(MODEL) if use_cache else None
+        probes = []
+        pending = []
+        for i, item in enumerate(items):
+            signature = get_item_signature(data, i, iso, fixed)
+            for objective in ("obj_costs", "obj_quality"):
+                probes.append(calculated[len(probes)])
+                if probes[-1] is not None and not VERIFY:
+                    continue
+                key = cache.get_key(signature, objective, model_hash) if use_cache else None
+                value = cache.load("probes", key) if use_cache and probes[-1] is None else None
+                if value is not None:
+                    probes[-1] = value
+                else:
+                    pending.append((len(probes)-1, key, objective, i))
+
+        logging.info(f"{len(probes)-len(pending)} of {len(probes)} item optima calculated or found in cache")
+
+        # probes run in waves of <workers>, every wave gets its share of the probe budget
+        limit = budget.get_limit(SHARES["probes"] / max(1, -(-len(pending) // workers)))
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            values = list(executor.map(tracer.wrap(lambda p: probe(model, constraints, p[2], p[3], limit), "probe"), pending))
+
+        for (idx, key, objective, i), (value, proven) in zip(pending, values):
+            if probes[idx] is not None:
+                # verification of a calculated value, the solver has the last word if it proved its value
+                if value is None or not proven:
+                    continue
+                if any(abs(a - b) > 1e-6 * max(1.0, abs(b)) for a, b in zip(probes[idx], value)):
+                    logging.warning(f"Calculated optimum of {objective}[{i+1}] {probes[idx]} differs from the solver probe {value}")
+            probes[idx] = value
+            if use_cache and value is not None and proven:
+                cache.store("probes", key, value)
+            result.proven &= proven
+
+    terms = []
     for i, item in enumerate(items):
 
-        # search for optimal values of individual objectives
         # --> costs / margin
-        res = opt(instance, f"obj = obj_costs[{item.midx}];")
+        res = probes[2*i]
         
         if not res:
             # something went wrong
@@ -157,8 +389,7 @@ def solve(data: AssignmentData, iso, target_active, steps):
             result.message = "Something went wrong!"
             return result
         
-        item.optimal_costs = res.objective
-        item.optimal_margin = res["margin"][i]
+        item.optimal_costs, item.optimal_margin = res
         
         # check if the item's target profit margin would be met, if the constraint is active
         if item.constrained and item.optimal_margin < item.target_margin:
@@ -167,13 +398,12 @@ def solve(data: AssignmentData, iso, target_active, steps):
             result.status = AssignmentStatus.ALTERNATIVE
             result.message = "At least one of the items' target profit margins cannot be reached. You could consider to lower them."
         
+            # the constraint is lowered to at least reach the optimal target profit margin
             item.satisfiable = False
-            # update the constraint to at least reach the optimal target profit margin
-            item.update_constraint(item.optimal_margin)
             item.distance = item.target_margin-item.optimal_margin 
 
         # --> quality     
-        res = opt(instance, f"obj = obj_quality[{item.midx}];")
+        res = probes[2*i+1]
 
         if not res:
             # something went wrong
@@ -181,50 +411,62 @@ def solve(data: AssignmentData, iso, target_active, steps):
             result.message = "Something went wrong!"
             return result
 
-        item.optimal_quality = res.objective
+        item.optimal_quality = res[0]
         
-        # put together weighted item objective
-        objective += f"({item.margin_weight}*(obj_costs[{item.midx}]/{item.optimal_costs}) + {item.quality_weight}*(obj_quality[{item.midx}]/{item.optimal_quality})) + " 
+        # put together weighted item objective (normalized by the optimal values)
+        terms.append((item.margin_weight / (item.optimal_costs or 1), ("obj_costs", i)))
+        terms.append((item.quality_weight / (item.optimal_quality or 1), ("obj_quality", i)))
 
     # add soft constraint costs
-    objective += f"parallel_violations + capacity_violations;"
+    terms.append((1.0, ("violations", None)))
 
     # add objective
-    instance.add_string(objective)
-    logging.debug(objective)
+    constraints.append(model.objective(terms))
+    logging.debug(constraints[-1])
 
     # try to find a solution without the target profit margin constraints
+    # (starting from the given hint, e.g. the last stored assignment of this order)
     logging.info("Start search without target profit margin constraints")
-    res = instance.solve()
-    logging.info(f"Solution found after {res.statistics['time']}")
-    solution = res.solution
+    stages = 3 if target_active else 2
+    with timed(result, "stage 1 (unconstrained)"):
+        res = run(model, data, constraints, hint, budget.get_limit(1/stages), "stage 1")
+    result.proven &= is_proven(res)
+    if res.solution is None:
+        logging.info(f"No solution found in stage 1: {res.status}")
+        result.status = AssignmentStatus.ERROR
+        result.message = "No assignment could be found within the time limit."
+        return result
+    solution, final = res.solution, res
     
     # add the (adjusted) items' target profit margin constraints if active
-    for item in items:
+    for i, item in enumerate(items):
         if item.constrained:
             logging.info(f"Item target profit margin constraint added for item {item.midx}")
-            instance.add_string(item.constraint)
+            constraints.append(model.at_least("margin", i, item.get_threshold()))
             
     # check if the problem instance is still solvable
+    # every stage starts from the solution of the previous stage
     logging.info("Start search with item target profit margin constraints")
-    res = instance.solve()
-    logging.info(f"Solution found after {res.statistics['time']}")
-    if res.status == Status.OPTIMAL_SOLUTION:
-        # yes, override the solution
-        solution = res.solution
+    with timed(result, "stage 2 (item margins)"):
+        res = run(model, data, constraints, solution.assigned, budget.get_limit(1/(stages-1)), "stage 2")
+    result.proven &= is_proven(res)
+    if res.solution is not None:
+        # yes (possibly not proven optimal), override the solution
+        solution, final = res.solution, res
 
         # add the project margin constraint if active
         if target_active:
             logging.info("Project target profit margin constraint added")
-            instance.add_string(PROJECT_MARGIN_CONSTRAINT)
+            constraints.append(model.at_least("profit_margin", None, float(data.target)))
 
             #check if the problem instance is still solvable
             logging.info("Start search with all active constraints")
-            res = instance.solve()
-            logging.info(f"Solution found after {res.statistics['time']}")
-            if res.status == Status.OPTIMAL_SOLUTION:
-                # yes, override the solution
-                solution = res.solution
+            with timed(result, "stage 3 (all constraints)"):
+                res = run(model, data, constraints, solution.assigned, budget.get_limit(), "stage 3")
+            result.proven &= is_proven(res)
+            if res.solution is not None:
+                # yes (possibly not proven optimal), override the solution
+                solution, final = res.solution, res
             else:
                 logging.info("UNSATISFIABLE: project target profit margin constraint")
                 result.status = AssignmentStatus.ALTERNATIVE
@@ -240,8 +482,23 @@ def solve(data: AssignmentData, iso, target_active, steps):
     result.items = items
 
     result.project_margin = solution.profit_margin
+    result.objective = solution.obj
     result.capacity_violations = solution.capacity_violations
     result.parallel_violations = solution.parallel_violations
+
+    # distance to the best bound of the solver, or to the bound of the normalized objective
+    if final.status == Status.OPTIMAL_SOLUTION:
+        result.objective_bound = result.objective
+        result.optimality_gap = 0.0
+    elif "objectiveBound" in final.statistics:
+        result.objective_bound = final.statistics["objectiveBound"]
+        result.optimality_gap = abs(result.objective - result.objective_bound) / max(abs(result.objective), 1e-9)
+    else:
+        result.optimality_gap = get_gap(result)
+
+    if not result.proven:
+        logging.info(f"Time budget ran out, best solution has a gap of {round(result.optimality_gap*100, 2)}%")
+        set_feasible(result)
     
     logging.debug(solution)
         
@@ -0,0 +1,133 @@
+import re
+import sys
+import json
+import time
+import logging
+import threading
+
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime
+
+import config as cfg
+
+PROFILES = getattr(cfg, "query_profiles", "profiles.jsonl") # summaries of profiled runs, one json object per line
+N_PLUS_ONE = 5 # executions of one statement from one caller with different parameters that look like a loop
+
+enabled = getattr(cfg, "profile_queries", False)
+lock = threading.Lock()
+queries = []
+
+@dataclass
+class Query:
+    function: str # dbconnector function that ran the query
+    caller: str # function that called it
+    shape: str # statement with literals and parameters replaced by ?
+    params: str
+    rows: int = 0
+    seconds: float = 0.0
+
+def enable():
+    global enabled
+    enabled = True
+
+def reset():
+    with lock:
+        queries.clear()
+
+def get_shape(statement):
+    shape = re.sub(r"\s+", " ", statement).strip()
+    shape = re.sub(r"'[^']*'|\b\d+\b|%s", "?", shape)
+    return re.sub(r"IN \((\?, )*\?\)", "IN (?)", shape, flags=re.IGNORECASE)
+
+def get_name(frame):
+    return f"{frame.f_globals.get('__name__', '?')}.{frame.f_code.co_name}"
+
+class Cursor:
+    # records every statement of the wrapped cursor, everything else is passed through
+
+    def __init__(self, cursor):
+        self.cursor = cursor
+        self.query = None
+
+    def execute(self, statement, params=None):
+        frame = sys._getframe(1)
+        self.query = Query(get_name(frame), get_name(frame.f_back) if frame.f_back else "?", get_shape(statement), repr(params))
+        with lock:
+            queries.append(self.query)
+
+        start = time.perf_counter()
+        try:
+            return self.cursor.execute(statement, params)
+        finally:
+            self.query.seconds += time.perf_counter() - start
+
+    def fetchall(self):
+        start = time.perf_counter()
+        rows = self.cursor.fetchall()
+        if self.query:
+            self.query.seconds += time.perf_counter() - start
+            self.query.rows += len(rows)
+        return rows
+
+    def __getattr__(self, name):
+        return getattr(self.cursor, name)
+
+def wrap(cursor):
+    return Cursor(cursor) if enabled else cursor
+
+def get_summary():
+    with lock:
+        records = list(queries)
+
+    functions = defaultdict(lambda: {"queries": 0, "rows": 0, "seconds": 0.0})
+    for q in records:
+        f = functions[q.function]
+        f["queries"] += 1
+        f["rows"] += q.rows
+        f["seconds"] += q.seconds
+
+    # identical statements with identical parameters
+    statements = defaultdict(list)
+    for q in records:
+        statements[(q.shape, q.params)].append(q)
+    repeated = [{"function": qs[0].function, "params": params, "count": len(qs), "seconds": sum(q.seconds for q in qs)}
+                for (shape, params), qs in statements.items() if len(qs) > 1]
+
+    # one statement executed in a loop of a caller with changing parameters
+    loops = defaultdict(list)
+    for q in records:
+        loops[(q.caller, q.function, q.shape)].append(q)
+    n_plus_one = [{"caller": caller, "function": function, "count": len(qs), "distinct_params": len({q.params for q in qs}), "seconds": sum(q.seconds for q in qs)}
+                  for (caller, function, shape), qs in loops.items() if len({q.params for q in qs}) >= N_PLUS_ONE]
+
+    return {
+        "queries": len(records),
+        "rows": sum(q.rows for q in records),
+        "seconds": sum(q.seconds for q in records),
+        "functions": dict(sorted(functions.items(), key=lambda f: -f[1]["seconds"])),
+        "repeated": sorted(repeated, key=lambda r: -r["count"]),
+        "n_plus_one": sorted(n_plus_one, key=lambda r: -r["count"]),
+    }
+
+def report(summary=None):
+    summary = summary or get_summary()
+    lines = [f"{summary['queries']} queries, {summary['rows']} rows, {summary['seconds']:.3f}s"]
+
+    lines.append(f"{'function':<48}{'queries':>8}{'rows':>10}{'seconds':>10}")
+    for name, f in summary["functions"].items():
+        lines.append(f"{name:<48}{f['queries']:>8}{f['rows']:>10}{f['seconds']:>10.3f}")
+
+    for r in summary["repeated"]:
+        lines.append(f"REPEATED {r['function']} {r['count']}x with {r['params']} ({r['seconds']:.3f}s)")
+    for r in summary["n_plus_one"]:
+        lines.append(f"N+1 {r['caller']} -> {r['function']}: {r['count']} queries with {r['distinct_params']} different parameters ({r['seconds']:.3f}s)")
+
+    return "\n".join(lines)
+
+def save(name, summary=None, path=PROFILES):
+    # profiles of runs are appended, improvements can be tracked over time
+    summary = summary or get_summary()
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps({"run": name, "created": datetime.now().isoformat(timespec="seconds"), **summary}) + "\n")
+    logging.info(f"Query profile of {name} appended to {path}")
@@ -0,0 +1,67 @@
+import copy
+import logging
+
+import numpy as np
+
+from collector import AssignmentData
+
+def get_dominance(data: AssignmentData):
+    # dominates[s, r]: s is eligible for every job of r with an equal or better rank, an equal or lower price,
+    # and has at least as many working minutes on every day
+    eligible = data.ranking > 0
+    dominates = np.zeros((data.n, data.n), dtype=bool)
+    for r in range(data.n):
+        jobs = eligible[r]
+        dominates[:, r] = (eligible[:, jobs].all(axis=1)
+                           & (data.ranking[:, jobs] <= data.ranking[r, jobs]).all(axis=1)
+                           & (data.price[:, jobs] <= data.price[r, jobs]).all(axis=1)
+                           & (data.schedule >= data.schedule[r]).all(axis=1))
+        dominates[r, r] = False
+    return dominates
+
+def prune(data: AssignmentData, hint=None, fixed=None):
+    # a dominated resource r is removed if it has at least as many dominating resources D as there are jobs
+    # eligible for any of them: one of D is then unused in every assignment that uses r, and all jobs of r
+    # can move to it without higher costs, worse ranks, more capacity, parallel or ISO violations
+    # returns the pruned problem instance and the indices (0..n-1) of the kept resources
+    protected = {r-1 for source in (hint, fixed) if source for r in source if r}
+    eligible = data.ranking > 0
+    dominates = get_dominance(data)
+
+    alive = np.ones(data.n, dtype=bool)
+    removed = True
+    while removed:
+        removed = False
+        for r in np.flatnonzero(alive):
+            if r in protected:
+                continue
+            dominating = dominates[:, r] & alive
+            if not eligible[r].any() or dominating.sum() >= eligible[dominating].any(axis=0).sum() > 0:
+                alive[r] = False
+                removed = True
+
+    kept = np.flatnonzero(alive)
+    if len(kept) == data.n:
+        return data, kept
+
+    pruned = copy.copy(data)
+    pruned.n = len(kept)
+    pruned.resources = [data.resources[r] for r in kept]
+    pruned.ranking = data.ranking[kept]
+    pruned.price = data.price[kept]
+    pruned.schedule = data.schedule[kept]
+
+    logging.info(f"Pruned {data.n - pruned.n} of {data.n} dominated resources, "
+                 f"{int(eligible.sum())} -> {int(eligible[kept].sum())} eligible resource/job pairs")
+    return pruned, kept
+
+def get_index(kept, assignment):
+    # resource indices of the instance (1..n) -> indices of the pruned instance, 0 = removed
+    if not assignment:
+        return assignment
+    index = {int(r)+1: p+1 for p, r in enumerate(kept)}
+    return [index.get(r, 0) for r in assignment]
+
+def restore(kept, assignment):
+    # resource indices of the pruned instance -> indices of the instance
+    return [int(kept[r-1])+1 for r in assignment]
@@ -0,0 +1,42 @@
+import glob
+import time
+import logging
+import argparse
+
+import minimizer
+import snapshot
+
+def replay(path, workers, use_cache):
+    start = time.perf_counter()
+    data, iso_active, target_active = snapshot.load(path)
+    loading = time.perf_counter() - start
+
+    start = time.perf_counter()
+    result = minimizer.solve(data, iso_active, target_active, None, workers, use_cache=use_cache)
+    total = time.perf_counter() - start
+
+    print(f"{path}: {result.status.name} (n={data.n}, m={data.m}, k={data.k}, l={data.l}, iso={iso_active}, target={target_active})")
+    print(f"  {'load':<28}{loading:10.3f}s")
+    for phase, duration in result.timings.items():
+        print(f"  {phase:<28}{duration:10.3f}s")
+    print(f"  {'total':<28}{total:10.3f}s")
+
+    return total
+
+if __name__ == "__main__":
+
+    logging.basicConfig(filename='logger.log', format='%(asctime)s %(levelname)s: %(message)s', datefmt='%d/%m/%y %H:%M:%S', level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description="Replay the solve phase of stored optimization instances without database or BM.")
+    parser.add_argument("snapshots", nargs="+", help="snapshot files or glob patterns (see main.py --snapshot)")
+    parser.add_argument("--workers", type=int, default=minimizer.WORKERS, help="number of parallel solver processes")
+    parser.add_argument("--cache", action="store_true", help="answer unchanged instances from the result cache")
+    args = parser.parse_args()
+
+    paths = sorted({path for pattern in args.snapshots for path in (glob.glob(pattern) or [pattern])})
+
+    total = 0.0
+    for path in paths:
+        total += replay(path, args.workers, args.cache)
+
+    print(f"{len(paths)} snapshot(s) replayed in {total:.3f}s")
@@ -0,0 +1,73 @@
+import time
+import enum
+
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import List
+
+import tracer
+
+class AssignmentStatus(enum.Enum):
+    UNSATISFIABLE = 1
+    OPTIMAL = 2
+    ALTERNATIVE = 3
+    ERROR = 4
+    FEASIBLE = 5 # valid assignment, but the time budget ran out before it was proven optimal
+
+@dataclass
+class AssignmentResult:
+    k: int # number of items
+
+    status: AssignmentStatus = AssignmentStatus.OPTIMAL
+    message: str = "A valid assignment of resources to all job that optimizes the given objectives was found." 
+
+    assignment: List = field(default_factory=list)
+
+    items: List = field(default_factory=list)
+    
+    project_margin: float = 0.0
+    objective: float = 0.0
+    objective_bound: float = None # best bound of the solver on the objective, if reported
+    optimality_gap: float = 0.0 # relative distance between objective and bound
+    proven: bool = True # no solve was stopped by its time limit
+    capacity_violations: int = 0
+    parallel_violations: int = 0
+
+    incremental: bool = False # only the jobs affected by changes were re-solved
+
+    timings: dict = field(default_factory=dict) # wall time in seconds per phase
+
+    def __post_init__(self):
+        self.optimal_costs = [0 for i in range(self.k)]
+        self.optimal_quality = [0 for i in range(self.k)]
+
+@dataclass
+class ItemResult:
+    midx: int   
+    constrained: bool
+    target_margin: float
+    
+    margin_weight: int
+    quality_weight: int
+
+    optimal_costs: float = 0.0
+    optimal_margin: float = 0.0
+    actual_margin: float = 0.0
+    optimal_quality: float = 0.0
+    actual_quality: float = 0.0
+
+    satisfiable: bool = True
+    distance: float = 0.0
+
+    def get_threshold(self):
+        # unreachable targets are lowered to the optimal margin of the item
+        return self.target_margin if self.satisfiable else self.optimal_margin
+
+@contextmanager
+def timed(result, phase):
+    start = time.perf_counter()
+    try:
+        with tracer.span(phase):
+            yield
+    finally:
+        result.timings[phase] = time.perf_counter() - start
@@ -0,0 +1,48 @@
+import json
+import logging
+
+import numpy as np
+
+import collector
+
+VERSION = 1
+
+def save(path, data, iso_active, target_active):
+    header = {
+        "version": VERSION,
+        "iso_active": bool(iso_active),
+        "target_active": bool(target_active),
+        "n": data.n,
+        "m": data.m,
+        "k": data.k,
+        "l": data.l,
+        "resources": data.resources,
+        "jobs": data.jobs,
+        "items": data.items,
+        "item_constraints": [bool(c) for c in data.item_constraints],
+        "target": float(data.target),
+        "jobtype": data.jobtype,
+        "workflow": data.workflow,
+        "item": [int(i) for i in data.item],
+        "parallel": data.parallel,
+    }
+    # numpy fields are stored as compressed arrays, everything else goes into the json header
+    arrays = {name: getattr(data, name) for name in collector.ARRAYS}
+
+    with open(path, 'wb') as f:
+        np.savez_compressed(f, header=np.array(json.dumps(header)), **arrays)
+    logging.info(f"Snapshot written to {path}")
+
+def load(path):
+    with np.load(path) as f:
+        header = json.loads(f["header"].item())
+        if header["version"] > VERSION:
+            raise ValueError(f"Snapshot {path} has version {header['version']}, only versions up to {VERSION} are supported")
+
+        data = collector.AssignmentData(header["n"], header["m"], header["k"], header["l"])
+        for name in ("resources", "jobs", "items", "item_constraints", "target", "jobtype", "workflow", "item", "parallel"):
+            setattr(data, name, header[name])
+        for name in collector.ARRAYS:
+            setattr(data, name, f[name])
+
+    return data, header["iso_active"], header["target_active"]
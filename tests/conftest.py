@@ -0,0 +1,12 @@
+import os
+import sys
+import types
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# config.py holds the credentials of a deployment and is not part of the repository,
+# every setting the tested modules read has a default
+try:
+    import config
+except ImportError:
+    sys.modules["config"] = types.ModuleType("config")
@@ -0,0 +1,19 @@
+import pytest
+
+import benchmark
+import cache
+import heuristic
+import minimizer
+
+def test_repeated_runs_are_cold(monkeypatch):
+    # every run of a case solves again, neither results nor probes come from the cache
+    def fail(*args, **kwargs):
+        pytest.fail("the benchmark touched the cache")
+    for name in ("get_key", "load", "store"):
+        monkeypatch.setattr(cache, name, fail)
+    monkeypatch.setattr(minimizer, "get_engine", lambda data, engine: "heuristic")
+    monkeypatch.setattr(heuristic, "BUDGET", 0.2)
+
+    run = benchmark.measure((10, 2, 14, True, "loose", 0), 2, 1)
+    assert run["status"] in ("OPTIMAL", "FEASIBLE")
+    assert "compression" in run["timings"] and "pruning" in run["timings"]
@@ -0,0 +1,76 @@
+import itertools
+
+import numpy as np
+import pytest
+
+import benchmark
+import calculator
+import heuristic
+from collector import AssignmentData
+
+def get_data(rng, n=3, m=5, k=2):
+    data = AssignmentData(n, m, k, 1)
+    data.item = [1, 2] + list(rng.integers(1, k+1, m-2))
+    data.profit = [100.0, 120.0]
+    data.jobtype = [rng.choice(["TRA", "REV"]) for j in range(m)]
+    data.workflow = [{"set": [int(s) for s in rng.choice(range(1, m+1), rng.integers(0, 3), replace=False)] or [-1]} for j in range(m)]
+    data.ranking = rng.integers(0, 4, (n, m))
+    data.ranking[rng.integers(0, n, m), range(m)] = rng.integers(1, 4, m)
+    data.price = rng.integers(1, 20, (n, m))
+    return data
+
+def get_pairs(data):
+    return [(j, s-1) for j in range(data.m) for s in data.workflow[j]["set"]
+            if s > 0 and data.jobtype[j] == "TRA" and data.jobtype[s-1] == "REV"]
+
+def enumerate_optimum(data, values, i, iso, fixed):
+    pairs = get_pairs(data) if iso else []
+    jobs = [j for j in range(data.m) if data.item[j] == i+1]
+    best = None
+    for a in itertools.product(range(data.n), repeat=data.m):
+        if any(data.ranking[a[j], j] == 0 or (fixed[j] and a[j] != fixed[j]-1) for j in range(data.m)):
+            continue
+        if any(a[j1] == a[j2] for j1, j2 in pairs):
+            continue
+        value = sum(values[a[j], j] for j in jobs) / len(jobs)
+        best = value if best is None else min(best, value)
+    return best
+
+@pytest.mark.parametrize("iso", [False, True])
+def test_optima_match_enumeration(iso):
+    rng = np.random.default_rng(1)
+    for t in range(60):
+        data = get_data(rng)
+        fixed = [0 for j in range(data.m)]
+        if t % 3 == 0:
+            j = int(rng.integers(data.m))
+            fixed[j] = int(np.flatnonzero(data.ranking[:, j])[0]) + 1
+
+        probes = calculator.calculate(data, iso, fixed)
+        for i in range(data.k):
+            for o, values in enumerate((data.price, data.ranking)):
+                expected = enumerate_optimum(data, values, i, iso, fixed)
+                if expected is None:
+                    assert probes[2*i+o] is None
+                else:
+                    assert probes[2*i+o][0] == pytest.approx(expected)
+
+def test_margin_of_the_cost_optimum():
+    data = benchmark.generate(20, 4, 14, seed=3)
+    probes = calculator.calculate(data, False)
+    costs = np.where(data.ranking > 0, data.price, np.inf).min(axis=0)
+    for i in range(data.k):
+        total = costs[np.asarray(data.item) == i+1].sum()
+        assert probes[2*i][1] == pytest.approx((data.profit[i] - total) / data.profit[i])
+
+def test_stopped_search_is_left_to_the_solver(monkeypatch):
+    monkeypatch.setattr(calculator, "MAX_NODES", 0)
+    rng = np.random.default_rng(2)
+    data = get_data(rng)
+    data.jobtype = ["TRA", "REV", "TRA", "REV", "TRA"]
+    data.workflow = [{"set": [2]}, {"set": [-1]}, {"set": [4]}, {"set": [-1]}, {"set": [-1]}]
+    data.item = [1, 1, 2, 2, 2]
+    assert calculator.calculate(data, True) == [None, None, None, None]
+    # the heuristic falls back to the values without ISO constraint
+    optimal_costs, optimal_quality, optimal_margin = heuristic.get_bounds(data, True)
+    assert list(optimal_costs) == [p[0] for p in calculator.calculate(data, False)[::2]]
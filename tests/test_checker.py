@@ -0,0 +1,51 @@
+import itertools
+
+import numpy as np
+
+import checker
+from collector import AssignmentData
+
+def get_data(rng, n=3, m=6):
+    data = AssignmentData(n, m, 1, 1)
+    data.jobs = [100+j for j in range(m)]
+    data.jobtype = [rng.choice(["TRA", "REV"]) for j in range(m)]
+    data.workflow = [{"set": [int(s) for s in rng.choice(range(1, m+1), rng.integers(0, 4), replace=False)] or [-1]} for j in range(m)]
+    data.ranking = (rng.random((n, m)) < 0.4).astype(int)
+    data.ranking[rng.integers(0, n, m), range(m)] = 1
+    return data
+
+def is_feasible(data):
+    pairs = [(j, s-1) for j in range(data.m) for s in data.workflow[j]["set"]
+             if s > 0 and data.jobtype[j] == "TRA" and data.jobtype[s-1] == "REV"]
+    return any(all(data.ranking[a[j], j] for j in range(data.m)) and all(a[j1] != a[j2] for j1, j2 in pairs)
+               for a in itertools.product(range(data.n), repeat=data.m))
+
+def test_unmatched_jobs():
+    data = AssignmentData(2, 3, 1, 1)
+    data.jobs = [7, 8, 9]
+    data.ranking = [[1, 0, 0], [2, 0, 1]]
+    assert checker.get_unmatched(data) == [1]
+    assert checker.get_names(data, checker.get_unmatched(data)) == "8"
+
+def test_iso_conflicts_match_enumeration():
+    rng = np.random.default_rng(2)
+    unsatisfiable = 0
+    for t in range(150):
+        data = get_data(rng)
+        conflicts = checker.get_iso_conflicts(data)
+        assert (conflicts == []) == is_feasible(data)
+        unsatisfiable += bool(conflicts)
+    assert unsatisfiable > 0
+
+def test_iso_conflict_names_the_jobs():
+    # translation and revision of job 100 can only be done by the same resource
+    data = AssignmentData(2, 3, 1, 1)
+    data.jobs = [100, 101, 102]
+    data.jobtype = ["TRA", "REV", "TRA"]
+    data.workflow = [{"set": [2]}, {"set": [-1]}, {"set": [-1]}]
+    data.ranking = [[1, 1, 1], [0, 0, 1]]
+    assert checker.get_iso_conflicts(data) == [0, 1]
+    # a kept resource of an incremental run counts as the only eligible one
+    data.ranking = [[1, 1, 1], [1, 0, 1]]
+    assert checker.get_iso_conflicts(data) == []
+    assert checker.get_iso_conflicts(data, fixed=[1, 0, 0]) == [0, 1]
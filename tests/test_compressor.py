@@ -0,0 +1,46 @@
+import numpy as np
+
+import benchmark
+import compressor
+
+def get_capacity_violations(data, assigned):
+    # days (weighted by their bucket size) on which a resource has more planned minutes than working minutes
+    load = np.zeros_like(data.schedule)
+    np.add.at(load, assigned, data.planned)
+    return int(((data.schedule - load < 0) * data.day_weights).sum())
+
+def test_buckets_keep_the_capacity_violations():
+    data = benchmark.generate(12, 5, 28, seed=4)
+    compressed = compressor.compress(data)
+
+    assert compressed.l < data.l
+    assert compressed.day_weights.sum() == data.l
+    assert data.l == 28 and data.planned.shape[1] == 28 # the instance itself is unchanged
+
+    rng = np.random.default_rng(4)
+    for t in range(20):
+        assigned = rng.integers(0, data.n, data.m)
+        assert get_capacity_violations(compressed, assigned) == get_capacity_violations(data, assigned)
+
+def test_identical_days_are_merged():
+    data = benchmark.generate(3, 1, 1, seed=0)
+    data.l = 4
+    data.schedule = [[8, 8, 0, 0]] * 3
+    data.planned = [[1, 1, 1, 1]] * data.m
+    data.day_weights = [1, 1, 1, 1]
+
+    compressed = compressor.compress(data)
+    assert compressed.l == 2
+    assert compressed.day_weights.tolist() == [2, 2]
+    assert compressed.schedule.tolist() == [[8, 0]] * 3
+
+def test_weighted_days_are_summed():
+    data = benchmark.generate(3, 1, 1, seed=0)
+    data.l = 4
+    data.schedule = [[8, 8, 8, 0]] * 3
+    data.planned = [[1, 1, 1, 1]] * data.m
+    data.day_weights = [2, 1, 1, 1]
+
+    compressed = compressor.compress(data)
+    assert compressed.day_weights.tolist() == [4, 1]
+    assert compressed.schedule.tolist() == [[8, 0]] * 3
@@ -0,0 +1,67 @@
+import numpy as np
+
+import decomposer
+import minimizer
+from collector import AssignmentData
+
+def get_data():
+    # items 1 and 2 share resource 0 on day 0, item 3 has its own resource, item 4 has no jobs
+    data = AssignmentData(3, 4, 4, 2)
+    data.resources = ["r0", "r1", "r2"]
+    data.jobs = [10, 11, 12, 13]
+    data.items = ["i1", "i2", "i3", "i4"]
+    data.item = [1, 2, 3, 3]
+    data.jobtype = ["TRA", "TRA", "TRA", "REV"]
+    data.profit = [100.0, 100.0, 100.0, 100.0]
+    data.item_constraints = [False, False, False, False]
+    data.item_targets = [0.2, 0.2, 0.2, 0.2]
+    data.target_weights = [1, 1, 1, 1]
+    data.ranking_weights = [1, 1, 1, 1]
+    data.ranking = [[1, 1, 0, 0], [0, 0, 1, 1], [0, 0, 1, 0]]
+    data.price = [[10, 20, 0, 0], [0, 0, 30, 40], [0, 0, 35, 0]]
+    data.planned = [[60, 0], [60, 0], [60, 60], [0, 60]]
+    return data
+
+def test_components():
+    data = get_data()
+    assert sorted(decomposer.get_components(data, False)) == [[0, 1], [2, 3]]
+
+    # jobs on different days do not interact
+    data.planned = [[60, 0], [0, 60], [60, 60], [0, 60]]
+    assert sorted(decomposer.get_components(data, False)) == [[0], [1], [2, 3]]
+
+    # jobs running in parallel interact if they can take the same resource
+    data.parallel = [[1, 2]]
+    assert sorted(decomposer.get_components(data, False)) == [[0, 1], [2, 3]]
+
+def test_iso_pairs_are_linked():
+    data = get_data()
+    data.item = [1, 2, 3, 4]
+    data.planned = [[60, 0], [0, 60], [60, 0], [0, 60]]
+    data.workflow = [{"set": [-1]}, {"set": [-1]}, {"set": [4]}, {"set": [-1]}]
+    assert sorted(decomposer.get_components(data, False)) == [[0], [1], [2], [3]]
+    assert sorted(decomposer.get_components(data, True)) == [[0], [1], [2, 3]]
+
+def test_part_and_merge():
+    data = get_data()
+    jobs = [2, 3]
+    part, items, resources = decomposer.get_part(data, jobs)
+    assert (part.n, part.m, part.k) == (2, 2, 1)
+    assert part.resources == ["r1", "r2"] and part.item == [1, 1] and items == [2]
+    assert part.price.tolist() == [[30, 40], [35, 0]]
+    assert decomposer.get_part_hint([1, 1, 3, 2], jobs, resources) == [2, 1]
+
+    def get_result(k, assignment, margin):
+        result = minimizer.AssignmentResult(k)
+        result.assignment = assignment
+        result.items = [minimizer.ItemResult(i+1, False, 0.2, 1, 1) for i in range(k)]
+        result.objective = 2.0 * k
+        result.project_margin = margin
+        return result
+
+    parts = [([0, 1], [0, 1], np.array([0])), (jobs, items, resources)]
+    result = decomposer.merge(data, parts, [get_result(2, [1, 1], 0.85), get_result(1, [1, 1], 0.3)])
+    assert result.assignment == [1, 1, 2, 2]
+    assert [item.midx for item in result.items] == [1, 2, 3, 4] # item 4 has no jobs and a default result
+    assert result.project_margin == (400 - 100) / 400
+    assert result.objective == 6.0
@@ -0,0 +1,71 @@
+import shutil
+from datetime import timedelta
+
+import pytest
+from minizinc import Status
+
+import benchmark
+import calculator
+import flat
+import minimizer
+
+FZN = """var 1..3: X_1;
+var 1..3: X_2;
+array [1..2] of var 1..3: assigned:: output_array([1..2]) = [X_1,X_2];
+var float: X_3;
+array [1..1] of var float: margin:: output_array([1..1]) = [X_3];
+array [1..1] of var float: obj_costs:: output_array([1..1]) = [0.5];
+var float: obj:: output_var;
+var float: profit_margin:: output_var = 0.25;
+var 0..1: iso_switch:: output_var;
+var float: violations:: output_var:: is_defined_var;
+constraint int_lin_le([1],[X_1],3);
+solve minimize obj;
+"""
+
+def test_parse_outputs():
+    model = flat.FlatModel(FZN, {})
+    assert "solve" not in model.text
+    assert model.get("assigned", 1) == "X_2"
+    assert model.get("obj") == "obj"
+    assert model.fixed == {"obj_costs": [0.5], "profit_margin": 0.25}
+
+def test_constraints():
+    model = flat.FlatModel(FZN, {})
+    assert model.fix("iso_switch", None, 1) == "constraint int_lin_eq([1], [iso_switch], 1);"
+    assert model.objective([(2.0, ("margin", 0)), (1.0, ("violations", None))]) == \
+        "constraint float_lin_eq([1.0, -2.0, -1.0], [obj, X_3, violations], 0.0);"
+    assert model.get_solve_item({0: 2}) == "solve :: warm_start([X_1], [2]) minimize obj;\n"
+
+def test_fixed_values_are_folded():
+    # constraints on fixed outputs hold (no constraint) or fail (a linear contradiction), never bool_eq
+    model = flat.FlatModel(FZN, {})
+    assert model.at_least("profit_margin", None, 0.2) == ""
+    assert model.at_least("profit_margin", None, 0.3) == flat.FAILED
+    assert model.objective([(1.0, ("obj_costs", 0))]) == "constraint float_lin_eq([1.0], [obj], 0.5);"
+
+def test_parse_value():
+    assert flat.parse_value("array1d(1..3, [1, 2, 3])") == [1, 2, 3]
+    assert flat.parse_value("0.5") == 0.5
+    assert flat.parse_value("true") is True
+
+@pytest.mark.skipif(shutil.which(flat.MINIZINC) is None, reason="MiniZinc is not installed")
+def test_solve_with_cbc():
+    data = benchmark.generate(6, 2, 7, seed=1)
+    limit = timedelta(seconds=30)
+    with minimizer.data_file(data) as path:
+        model = flat.flatten(minimizer.get_model(minimizer.MODEL), minimizer.get_solver(flat.SOLVER), path, limit)
+    constraints = [model.fix("iso_switch", None, 0)]
+
+    res = model.solve(constraints + [model.objective([])], None, limit, "test")
+    assert res.status in (Status.SATISFIED, Status.OPTIMAL_SOLUTION)
+    assert len(res["assigned"]) == data.m
+
+    # the solver probe agrees with the calculated optimum
+    res = model.solve(constraints + [model.objective([(1.0, ("obj_costs", 0))])], None, limit, "probe")
+    assert res.status == Status.OPTIMAL_SOLUTION
+    assert res.objective == pytest.approx(calculator.calculate(data, False)[0][0])
+
+    # unreachable margins make the instance unsatisfiable, also when the margin is fixed
+    res = model.solve(constraints + [model.objective([]), model.at_least("profit_margin", None, 2.0)], None, limit, "unsat")
+    assert res.status == Status.UNSATISFIABLE
@@ -0,0 +1,17 @@
+import bmconnector
+import main
+import minimizer
+
+def test_note_statistics_are_replaced(monkeypatch):
+    notes = {"i1": "translate carefully"}
+    monkeypatch.setattr(bmconnector, "get_note", lambda item_id: notes[item_id])
+    monkeypatch.setattr(bmconnector, "set_note", lambda item_id, note: notes.__setitem__(item_id, note))
+
+    item = minimizer.ItemResult(1, False, 0.2, 1, 1, 100.0, 0.3, 0.25, 1.0, 1.2)
+    main.update_note("i1", item)
+    first = notes["i1"]
+    assert first.startswith("translate carefully" + main.SEPARATOR)
+
+    # a retried or repeated write-back leaves a single statistics block
+    main.update_note("i1", item)
+    assert notes["i1"] == first
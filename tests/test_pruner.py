@@ -0,0 +1,69 @@
+import itertools
+
+import numpy as np
+
+import collector
+import pruner
+from collector import AssignmentData
+
+def get_data(rng, n=6, m=3, l=2):
+    data = AssignmentData(n, m, 1, l)
+    data.resources = list(range(n))
+    data.jobtype = [rng.choice(["TRA", "REV"]) for j in range(m)]
+    data.workflow = [{"set": [2]}, {"set": [3]}, {"set": [-1]}]
+    data.ranking = (rng.random((n, m)) < 0.7) * rng.integers(1, 3, (n, m))
+    data.ranking[0] = 1
+    data.price = rng.integers(1, 4, (n, m))
+    data.schedule = rng.integers(0, 3, (n, l))
+    data.planned = rng.integers(0, 3, (m, l))
+    data.parallel = collector.get_parallel_pairs(data.planned)
+    return data
+
+def get_optimum(data):
+    # costs, ranks and soft constraint violations of the best ISO compliant assignment
+    pairs = [(j, s-1) for j in range(data.m) for s in data.workflow[j]["set"]
+             if s > 0 and data.jobtype[j] == "TRA" and data.jobtype[s-1] == "REV"]
+    best = None
+    for a in itertools.product(range(data.n), repeat=data.m):
+        if any(data.ranking[a[j], j] == 0 for j in range(data.m)) or any(a[j1] == a[j2] for j1, j2 in pairs):
+            continue
+        value = sum(data.price[a[j], j] + data.ranking[a[j], j] for j in range(data.m))
+        value += sum(a[j1-1] == a[j2-1] for j1, j2 in data.parallel)
+        value += sum(data.schedule[r, d] < sum(data.planned[j, d] for j in range(data.m) if a[j] == r)
+                     for r in range(data.n) for d in range(data.l))
+        best = value if best is None else min(best, value)
+    return best
+
+def test_pruning_keeps_the_optimum():
+    rng = np.random.default_rng(3)
+    removed = 0
+    for t in range(120):
+        data = get_data(rng)
+        pruned, kept = pruner.prune(data)
+        removed += data.n - pruned.n
+        assert get_optimum(pruned) == get_optimum(data)
+    assert removed > 0
+
+def test_hinted_and_fixed_resources_are_kept():
+    # resource b is dominated by resource a and resource c has no jobs
+    data = AssignmentData(3, 1, 1, 1)
+    data.resources = ["a", "b", "c"]
+    data.ranking = [[1], [2], [0]]
+    data.price = [[1], [2], [0]]
+    data.schedule = [[8], [8], [8]]
+
+    pruned, kept = pruner.prune(data)
+    assert list(kept) == [0] and pruned.resources == ["a"] and pruned.ranking.shape == (1, 1)
+
+    assert list(pruner.prune(data, hint=[3])[1]) == [0, 2]
+    assert list(pruner.prune(data, fixed=[2])[1]) == [0, 1]
+
+    # with less schedule resource a no longer dominates b
+    data.schedule = [[4], [8], [8]]
+    assert list(pruner.prune(data)[1]) == [0, 1]
+
+def test_indices_are_mapped_both_ways():
+    kept = np.array([1, 3, 4])
+    assert pruner.get_index(kept, [2, 1, 5, 0]) == [1, 0, 3, 0]
+    assert pruner.restore(kept, [1, 2, 3]) == [2, 4, 5]
+    assert pruner.get_index(kept, None) is None
@@ -0,0 +1,15 @@
+import benchmark
+import collector
+import snapshot
+
+def test_snapshot_round_trip(tmp_path):
+    data = benchmark.generate(6, 2, 7, seed=1)
+    path = str(tmp_path / "order.npz")
+    snapshot.save(path, data, True, False)
+
+    loaded, iso_active, target_active = snapshot.load(path)
+    assert (iso_active, target_active) == (True, False)
+    assert (loaded.n, loaded.m, loaded.k, loaded.l) == (data.n, data.m, data.k, data.l)
+    assert loaded.jobtype == data.jobtype and loaded.parallel == [list(pair) for pair in data.parallel]
+    for name in collector.ARRAYS:
+        assert (getattr(loaded, name) == getattr(data, name)).all()
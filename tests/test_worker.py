@@ -0,0 +1,87 @@
+import time
+import threading
+
+import worker
+
+def test_read_skips_invalid_requests(tmp_path):
+    path = str(tmp_path / "spool.jsonl")
+    worker.submit("1", path=path)
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write("not json\n[]\n{\"incremental\": true}\n")
+    worker.submit("2", incremental=True, path=path)
+
+    requests, offset = worker.read(path, 0)
+    assert requests == [{"order": "1", "incremental": False}, {"order": "2", "incremental": True}]
+
+    # nothing new since the offset
+    assert worker.read(path, offset) == ([], offset)
+
+def test_read_waits_for_complete_lines(tmp_path):
+    path = str(tmp_path / "spool.jsonl")
+    worker.submit("1", path=path)
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write("{\"order\": \"2\"")
+
+    requests, offset = worker.read(path, 0)
+    assert [r["order"] for r in requests] == ["1"]
+
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write("}\n")
+    requests, offset = worker.read(path, offset)
+    assert [r["order"] for r in requests] == ["2"]
+
+def test_missing_spool(tmp_path):
+    assert worker.read(str(tmp_path / "missing.jsonl"), 0) == ([], 0)
+
+def test_offset_is_stored(tmp_path):
+    path = str(tmp_path / "spool.jsonl")
+    assert worker.load_offset(path) == 0
+    worker.store_offset(path, 42)
+    assert worker.load_offset(path) == 42
+
+def get_worker(solves=1):
+    # the stub blocks every run until it is released and records the request it got
+    runs = []
+    started = threading.Semaphore(0)
+    release = threading.Event()
+    def solve(order, request):
+        runs.append((order, request))
+        started.release()
+        assert release.wait(5)
+    return worker.Worker("host", solves, solve), runs, started, release
+
+def wait(w):
+    for t in range(500):
+        with w.lock:
+            if not w.queued and not w.active:
+                break
+        time.sleep(0.01)
+    w.executor.shutdown(wait=True)
+
+def test_queued_requests_are_merged():
+    w, runs, started, release = get_worker()
+    w.submit({"order": "1"})
+    assert started.acquire(timeout=5)
+
+    # order 2 waits for the only solve slot, its requests are merged into one run with the last request
+    w.submit({"order": "2", "incremental": False})
+    w.submit({"order": 2, "incremental": True})
+    release.set()
+    wait(w)
+
+    assert runs == [("1", {"order": "1"}), ("2", {"order": 2, "incremental": True})]
+
+def test_request_for_an_active_order_runs_once_more():
+    w, runs, started, release = get_worker(2)
+    w.submit({"order": "1"})
+    assert started.acquire(timeout=5)
+
+    # the running solve may have read outdated data, both requests lead to one follow-up run
+    w.submit({"order": "1", "incremental": True})
+    w.submit({"order": "1", "incremental": False})
+    assert w.again == {"1": {"order": "1", "incremental": False}}
+    release.set()
+    wait(w)
+
+    assert runs == [("1", {"order": "1"}), ("1", {"order": "1", "incremental": False})]
+    assert not w.again
@@ -0,0 +1,178 @@
+import os
+import re
+import json
+import time
+import logging
+import threading
+import contextvars
+
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import List
+
+import config as cfg
+
+TRACES = getattr(cfg, "traces", "traces") # directory of the json trace files, None = no export
+TEXTFILES = getattr(cfg, "metrics_textfiles", "metrics") # directory read by the prometheus textfile collector, None = no export
+
+# minizinc statistics that are kept per solve, times in seconds
+STATISTICS = ("time", "flatTime", "solveTime", "initTime", "nodes", "failures", "solutions", "objective", "objectiveBound")
+
+@dataclass
+class Span:
+    name: str
+    start: float = 0.0
+    duration: float = 0.0
+    attributes: dict = field(default_factory=dict)
+    children: List = field(default_factory=list)
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def record(self, statistics):
+        # minizinc statistics of a solve
+        for name in STATISTICS:
+            value = statistics.get(name)
+            if isinstance(value, timedelta):
+                value = value.total_seconds()
+            if isinstance(value, (int, float)):
+                self.attributes[name] = value
+
+    def to_json(self, origin):
+        return {
+            "name": self.name,
+            "start": round(self.start - origin, 6),
+            "duration": round(self.duration, 6),
+            "attributes": self.attributes,
+            "children": [child.to_json(origin) for child in self.children],
+        }
+
+current = contextvars.ContextVar("span", default=None)
+lock = threading.Lock()
+
+@contextmanager
+def span(name, **attributes):
+    # spans outside of a trace are not recorded
+    parent = current.get()
+    if parent is None:
+        yield Span(name)
+        return
+
+    s = Span(name, time.perf_counter(), attributes=attributes)
+    with lock:
+        parent.children.append(s)
+    token = current.set(s)
+    try:
+        yield s
+    finally:
+        s.duration = time.perf_counter() - s.start
+        current.reset(token)
+
+@contextmanager
+def record(name, **attributes):
+    # root span that is not exported, e.g. of work in another process that is attached to the parent's trace
+    root = Span(name, time.perf_counter(), attributes=attributes)
+    token = current.set(root)
+    try:
+        yield root
+    finally:
+        root.duration = time.perf_counter() - root.start
+        current.reset(token)
+
+@contextmanager
+def trace(name, **attributes):
+    # root span of a run, exported when the run is finished
+    try:
+        with record(name, **attributes) as root:
+            yield root
+    finally:
+        try:
+            export(root)
+        except OSError as err:
+            logging.warning(f"Trace of {name} could not be exported: {err}")
+
+def attach(s: Span):
+    # perf_counter is a system-wide monotonic clock, spans of other processes keep their place in time
+    parent = current.get()
+    if parent is not None:
+        with lock:
+            parent.children.append(s)
+
+def wrap(function, name=None):
+    # spans of the function are attached to the current span, also when it runs in another thread
+    parent = current.get()
+    def call(*args, **kwargs):
+        token = current.set(parent)
+        try:
+            if name is None:
+                return function(*args, **kwargs)
+            with span(name):
+                return function(*args, **kwargs)
+        finally:
+            current.reset(token)
+    return call
+
+def get_label(name):
+    return re.sub(r"[^a-zA-Z0-9_]", "_", str(name)).strip("_").lower()
+
+def collect(s: Span, path, phases):
+    # spans with the same path (e.g. all probes) are aggregated
+    path = f"{path}/{s.name}" if path else s.name
+    entry = phases.setdefault(path, {"seconds": 0.0, "count": 0, "statistics": {}})
+    entry["seconds"] += s.duration
+    entry["count"] += 1
+    for name, value in s.attributes.items():
+        if name in STATISTICS and name not in ("objective", "objectiveBound"):
+            entry["statistics"][name] = entry["statistics"].get(name, 0) + value
+        elif name in STATISTICS:
+            entry["statistics"][name] = value
+    for child in s.children:
+        collect(child, path, phases)
+    return phases
+
+def get_metrics(root: Span):
+    run = get_label(root.name)
+    lines = [
+        "# HELP optimizer_run_seconds Wall time of the last run",
+        "# TYPE optimizer_run_seconds gauge",
+        f'optimizer_run_seconds{{run="{run}"}} {root.duration:.6f}',
+        "# HELP optimizer_run_timestamp_seconds End of the last run",
+        "# TYPE optimizer_run_timestamp_seconds gauge",
+        f'optimizer_run_timestamp_seconds{{run="{run}"}} {time.time():.0f}',
+    ]
+
+    # phases are named by their path below the root, e.g. "solve/probes/probe"
+    phases = {}
+    for child in root.children:
+        collect(child, "", phases)
+    for metric, key, description in (("optimizer_phase_seconds", "seconds", "Wall time per phase of the last run"),
+                                     ("optimizer_phase_count", "count", "Number of spans per phase of the last run")):
+        lines += [f"# HELP {metric} {description}", f"# TYPE {metric} gauge"]
+        lines += [f'{metric}{{run="{run}",phase="{path}"}} {entry[key]}' for path, entry in phases.items()]
+
+    lines += ["# HELP optimizer_minizinc_statistic MiniZinc statistics per phase of the last run (times in seconds)",
+              "# TYPE optimizer_minizinc_statistic gauge"]
+    for path, entry in phases.items():
+        for name, value in entry["statistics"].items():
+            lines.append(f'optimizer_minizinc_statistic{{run="{run}",phase="{path}",statistic="{name}"}} {value}')
+
+    return "\n".join(lines) + "\n"
+
+def export(root: Span):
+    label = get_label(root.name)
+
+    if TRACES:
+        os.makedirs(TRACES, exist_ok=True)
+        path = os.path.join(TRACES, f"{label}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(root.to_json(root.start), f, indent=1, default=str)
+        logging.info(f"Trace written to {path}")
+
+    if TEXTFILES:
+        # written to a temporary file first, the collector must not read half a file
+        os.makedirs(TEXTFILES, exist_ok=True)
+        path = os.path.join(TEXTFILES, f"optimizer_{label}.prom")
+        with open(path + ".tmp", 'w', encoding='utf-8') as f:
+            f.write(get_metrics(root))
+        os.replace(path + ".tmp", path)
@@ -0,0 +1,148 @@
+import os
+import sys
+import json
+import time
+import signal
+import logging
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+
+import config as cfg
+import bmconnector
+import tracer
+import writer
+import main
+
+SPOOL = getattr(cfg, "spool", "spool.jsonl") # requests are appended to this file, one json object per line
+SOLVES = getattr(cfg, "worker_solves", 2) # max. number of concurrent solves
+POLL = 1.0 # seconds between two looks at the spool
+
+def submit(order, incremental=False, path=SPOOL):
+    # appends are atomic for lines of this size, producers need no lock
+    line = json.dumps({"order": order, "incremental": incremental}) + "\n"
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(line)
+
+def read(path, offset):
+    # new complete lines since offset, a partially written last line is read next time
+    if not os.path.exists(path):
+        return [], offset
+
+    requests = []
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            offset += len(line)
+            try:
+                request = json.loads(line)
+            except json.JSONDecodeError:
+                request = None
+            if not isinstance(request, dict) or "order" not in request:
+                logging.warning(f"Skipping invalid request in {path}: {line!r}")
+                continue
+            requests.append(request)
+    return requests, offset
+
+def load_offset(path):
+    try:
+        with open(path + ".offset", encoding='utf-8') as f:
+            return int(f.read())
+    except (OSError, ValueError):
+        return 0
+
+def store_offset(path, offset):
+    with open(path + ".offset", 'w', encoding='utf-8') as f:
+        f.write(str(offset))
+
+class Worker:
+
+    def __init__(self, host, solves=SOLVES, solve=None):
+        self.host = host
+        self.solve = solve or self.optimize # called with (order, request) per run
+        self.executor = ThreadPoolExecutor(max_workers=solves)
+        self.lock = threading.Lock()
+        self.queued = {} # order -> request, waiting for a free solve slot
+        self.active = set() # orders that are being solved
+        self.again = {} # order -> request that arrived while the order was being solved
+
+    def submit(self, request):
+        order = str(request["order"])
+        with self.lock:
+            if order in self.active:
+                # the running solve may have read outdated data, the order is solved once more afterwards
+                logging.info(f"Order {order} is being solved, request merged into one follow-up run")
+                self.again[order] = request
+            elif order in self.queued:
+                logging.info(f"Order {order} is already queued, request merged")
+                self.queued[order] = request
+            else:
+                self.queued[order] = request
+                self.executor.submit(self.process, order)
+
+    def process(self, order):
+        with self.lock:
+            request = self.queued.pop(order)
+            self.active.add(order)
+
+        try:
+            with tracer.trace(f"order {order}", order=order):
+                self.solve(order, request)
+        except Exception:
+            logging.exception(f"Optimization of order {order} failed")
+        finally:
+            with self.lock:
+                self.active.discard(order)
+                if order in self.again:
+                    self.queued[order] = self.again.pop(order)
+                    self.executor.submit(self.process, order)
+
+    def optimize(self, order, request):
+        start = time.perf_counter()
+        data, result, target_active = main.optimize(order, request.get("incremental", False))
+        results = main.publish(order, data, result, target_active)
+        logging.info(f"Order {order} finished with {result.status.name} after {round(time.perf_counter() - start, 2)}s: {writer.summarize(results)}")
+
+    def run(self, path=SPOOL):
+        stopped = threading.Event()
+        signal.signal(signal.SIGTERM, lambda signum, frame: stopped.set())
+        signal.signal(signal.SIGINT, lambda signum, frame: stopped.set())
+
+        # the BM session stays logged in, an expired uuid is renewed on the next call
+        bmconnector.login(self.host)
+        logging.info(f"Worker started for {self.host}, reading requests from {path}")
+
+        offset = load_offset(path)
+        if os.path.exists(path) and offset > os.path.getsize(path):
+            offset = 0 # the spool was truncated or replaced
+        while not stopped.is_set():
+            requests, offset = read(path, offset)
+            for request in requests:
+                self.submit(request)
+            if requests:
+                store_offset(path, offset)
+            stopped.wait(POLL)
+
+        logging.info("Worker stopping, waiting for running solves")
+        # queued follow-up runs are submitted from running solves, so the executor is drained before shutdown
+        while True:
+            with self.lock:
+                if not self.queued and not self.active:
+                    break
+            time.sleep(POLL)
+        self.executor.shutdown(wait=True)
+
+if __name__ == "__main__":
+
+    logging.basicConfig(filename='worker.log', format='%(asctime)s %(levelname)s: %(threadName)s: %(message)s', datefmt='%d/%m/%y %H:%M:%S', level=logging.INFO)
+
+    # parse arguments [scriptname, host] or [scriptname, submit, order, (--incremental)]
+    if len(sys.argv) > 2 and sys.argv[1] == "submit":
+        submit(sys.argv[2], "--incremental" in sys.argv[3:])
+    elif len(sys.argv) == 2:
+        Worker(sys.argv[1]).run()
+    else:
+        print("usage: worker.py <host> | worker.py submit <order> [--incremental]")
+        sys.exit(1)
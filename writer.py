@@ -0,0 +1,74 @@
+import logging
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import List
+
+import mysql.connector
+import requests
+from zeep.exceptions import TransportError
+
+import config as cfg
+import tracer
+
+WORKERS = getattr(cfg, "writeback_workers", 8) # max. number of concurrent calls
+RETRIES = getattr(cfg, "writeback_retries", 3) # retries per call after a transient failure
+BACKOFF = 0.5 # seconds before the first retry, doubled with every further retry
+
+# failures that are worth another try, everything else fails the call immediately
+TRANSIENT = (requests.exceptions.ConnectionError, requests.exceptions.Timeout, TransportError,
+             mysql.connector.errors.OperationalError, mysql.connector.errors.InterfaceError)
+
+@dataclass
+class WriteResult:
+    name: str
+    success: bool = False
+    attempts: int = 0
+    message: str = ""
+
+def call(name, task, retries, backoff):
+    result = WriteResult(name)
+
+    while True:
+        result.attempts += 1
+        try:
+            # a task returns False if the BM rejected the call
+            result.success = task() is not False
+            result.message = "" if result.success else "rejected"
+            return result
+        except TRANSIENT as err:
+            result.message = str(err)
+            if result.attempts > retries:
+                logging.warning(f"Giving up on {name} after {result.attempts} attempts: {err}")
+                return result
+            delay = backoff * 2 ** (result.attempts - 1)
+            logging.info(f"Transient failure for {name}, retrying in {delay}s: {err}")
+            time.sleep(delay)
+        except Exception as err:
+            logging.error(f"{name} failed: {err}")
+            result.message = str(err)
+            return result
+
+def run(tasks, workers=WORKERS, retries=RETRIES, backoff=BACKOFF) -> List[WriteResult]:
+    # tasks is a list of (name, callable) pairs
+    if not tasks:
+        return []
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(tracer.wrap(call), name, task, retries, backoff) for name, task in tasks]
+        results = [future.result() for future in futures]
+
+    failed = [r for r in results if not r.success]
+    logging.info(f"Write-back finished: {len(results)-len(failed)} of {len(results)} calls succeeded")
+    for r in failed:
+        logging.warning(f"Write-back failed for {r.name} after {r.attempts} attempt(s): {r.message}")
+
+    return results
+
+def summarize(results: List[WriteResult]):
+    failed = [r for r in results if not r.success]
+    summary = f"{len(results)-len(failed)}/{len(results)} write-back calls succeeded"
+    for r in failed:
+        summary += f"\n  failed: {r.name} ({r.message})"
+    return summary